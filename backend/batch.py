@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+批量提取字幕
+对目录或清单文件中的多个视频提取字幕，每个工作进程顺序处理多个视频，
+检测与识别模型在同一工作进程中只加载一次；多个工作进程在CPU与内存预算内并发处理不同的视频
+
+用法：
+    python batch.py <视频目录或清单文件> [--jobs N] [--cpu-budget N] [--memory-budget GB] [--report report.json]
+清单文件为每行一个视频，可在路径后附加字幕区域：<视频路径> [ymin ymax xmin xmax]
+也可以是json列表：[{"video": "<视频路径>", "sub_area": [ymin, ymax, xmin, xmax]}, ...]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(__file__))
+import config
+
+# 可以处理的视频格式
+VIDEO_EXTENSIONS = ('.mp4', '.flv', '.wmv', '.avi', '.mkv', '.mov', '.m4v', '.ts')
+
+# 批量任务: video_path视频路径, sub_area字幕区域 (ymin, ymax, xmin, xmax)
+BatchJob = namedtuple('BatchJob', 'video_path sub_area', defaults=(None,))
+
+# 工作进程中每个OCR使用的CPU线程数，由_init_worker设置
+_cpu_threads = None
+
+
+def collect_jobs(source):
+    """
+    从视频目录或清单文件中收集批量任务
+    :param source 视频目录、清单文件(.txt/.json)或单个视频路径
+    :return [BatchJob]
+    """
+    if os.path.isdir(source):
+        jobs = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    jobs.append(BatchJob(os.path.join(root, name)))
+        return sorted(jobs)
+    if source.lower().endswith(VIDEO_EXTENSIONS):
+        return [BatchJob(source)]
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, mode='r', encoding='utf-8') as f:
+        if source.lower().endswith('.json'):
+            items = [(item['video'], item.get('sub_area')) for item in json.load(f)]
+        else:
+            items = []
+            for line in f:
+                fields = line.strip().rsplit(maxsplit=4)
+                if len(fields) == 0 or fields[0].startswith('#'):
+                    continue
+                if len(fields) == 5 and all(field.lstrip('-').isdigit() for field in fields[1:]):
+                    items.append((fields[0], fields[1:]))
+                else:
+                    items.append((line.strip(), None))
+    # 清单中的相对路径相对于清单文件所在目录
+    return [BatchJob(os.path.join(base_dir, video_path),
+                     tuple(int(i) for i in sub_area) if sub_area is not None else None)
+            for video_path, sub_area in items]
+
+
+def batch_worker_config(jobs=0, cpu_budget=0, memory_budget=0):
+    """
+    根据CPU与内存预算计算同时处理的视频数量以及每个视频的CPU推理线程数
+    :param jobs 同时处理的视频数量，小于等于0时自动计算
+    :param cpu_budget 可以使用的CPU核数，小于等于0时使用全部核数
+    :param memory_budget 可以使用的内存(GB)，小于等于0时不限制
+    :return (jobs同时处理的视频数量, cpu_threads每个视频的CPU推理线程数)
+    """
+    cpu_budget = cpu_budget if cpu_budget > 0 else (os.cpu_count() or 1)
+    if jobs <= 0:
+        # 使用GPU时显存是瓶颈，只处理一个视频
+        jobs = 1 if config.USE_GPU else max(cpu_budget // config.CPU_THREADS, 1)
+    if memory_budget > 0:
+        jobs = min(jobs, max(int(memory_budget // config.BATCH_JOB_MEMORY_GB), 1))
+    return jobs, max(cpu_budget // jobs, 1)
+
+
+def _init_worker(cpu_threads):
+    global _cpu_threads
+    _cpu_threads = cpu_threads
+
+
+def _run_job(job):
+    """
+    在工作进程中提取一个视频的字幕，OCR在当前进程中进行，以便复用模型池中的模型
+    """
+    from main import SubtitleExtractor
+    from tools.predictor_pool import predictor_pool
+    start_time = time.time()
+    report = {'video': job.video_path, 'sub_area': job.sub_area, 'pid': os.getpid()}
+    try:
+        se = SubtitleExtractor(job.video_path, job.sub_area, interactive=False, ocr_in_process=True,
+                               cpu_threads=_cpu_threads)
+        se.run()
+        report['status'] = 'done'
+        report['srt'] = os.path.splitext(job.video_path)[0] + '.srt'
+        report['frame_count'] = se.frame_count
+    except Exception:
+        report['status'] = 'failed'
+        report['error'] = traceback.format_exc()
+    report['elapsed'] = round(time.time() - start_time, 2)
+    report['model_pool'] = predictor_pool.stats()
+    return report
+
+
+def _write_report(report_path, report):
+    if report_path is None:
+        return
+    with open(report_path, mode='w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def run_batch(source, jobs=0, cpu_budget=0, memory_budget=0, report_path=None):
+    """
+    批量提取字幕
+    :param source 视频目录、清单文件或BatchJob列表
+    :param jobs 同时处理的视频数量，小于等于0时根据预算自动计算
+    :param cpu_budget 可以使用的CPU核数
+    :param memory_budget 可以使用的内存(GB)
+    :param report_path 任务状态与耗时报告的输出路径(json)，每完成一个视频更新一次
+    :return 报告
+    """
+    batch_jobs = collect_jobs(source) if isinstance(source, str) else [BatchJob(*job) for job in source]
+    jobs, cpu_threads = batch_worker_config(jobs or config.BATCH_JOBS, cpu_budget, memory_budget)
+    jobs = max(min(jobs, len(batch_jobs)), 1)
+    print(f'Batch: {len(batch_jobs)} videos, {jobs} jobs, cpu threads per job: {cpu_threads}')
+    start_time = time.time()
+    report = {'jobs': jobs, 'cpu_threads': cpu_threads,
+              'videos': [{'video': job.video_path, 'status': 'pending'} for job in batch_jobs]}
+    _write_report(report_path, report)
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(cpu_threads,)) as executor:
+        futures = {executor.submit(_run_job, job): index for index, job in enumerate(batch_jobs)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                job_report = future.result()
+            except Exception:
+                # 工作进程异常退出
+                job_report = {'video': batch_jobs[index].video_path, 'status': 'failed',
+                              'error': traceback.format_exc()}
+            report['videos'][index] = job_report
+            print(f"[{job_report['status']}] {job_report['video']} {job_report.get('elapsed', '')}s")
+            _write_report(report_path, report)
+    report['elapsed'] = round(time.time() - start_time, 2)
+    report['failed'] = sum(1 for item in report['videos'] if item['status'] != 'done')
+    _write_report(report_path, report)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='batch subtitle extraction')
+    parser.add_argument('source', help='video directory, manifest file (.txt/.json) or video path')
+    parser.add_argument('--jobs', type=int, default=0, help='number of videos processed concurrently')
+    parser.add_argument('--cpu-budget', type=int, default=0, help='number of CPU cores to use')
+    parser.add_argument('--memory-budget', type=float, default=0, help='memory to use in GB')
+    parser.add_argument('--report', default=None, help='path of the json status/timing report')
+    args = parser.parse_args(argv)
+    report_path = args.report
+    if report_path is None:
+        base = args.source if os.path.isdir(args.source) else os.path.dirname(os.path.abspath(args.source))
+        report_path = os.path.join(base, 'batch_report.json')
+    report = run_batch(args.source, args.jobs, args.cpu_budget, args.memory_budget, report_path)
+    print(f"Batch finished in {report['elapsed']}s, failed: {report['failed']}, report: {report_path}")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method("spawn")
+    sys.exit(main())
@@ -86,7 +86,7 @@ REC_CHAR_TYPE = settings_config['DEFAULT']['Language']
 # 设置识别模式
 MODE_TYPE = settings_config['DEFAULT']['Mode']
 ACCURATE_MODE_ON = False
-if MODE_TYPE == 'accurate':
+if MODE_TYPE in ('accurate', 'accurate_cpu'):
     ACCURATE_MODE_ON = True
 if MODE_TYPE == 'fast':
     ACCURATE_MODE_ON = False
@@ -157,6 +157,18 @@ if REC_CHAR_TYPE in MULTI_LANG:
         else:
             DET_MODEL_PATH = os.path.join(DET_MODEL_BASE, MODEL_VERSION, 'ch_det_fast')
             REC_MODEL_PATH = os.path.join(REC_MODEL_BASE, MODEL_VERSION, f'{REC_CHAR_TYPE}_rec_fast')
+    # CPU精准模式需要逐帧检测，检测使用轻量级模型，识别使用大模型
+    elif MODE_TYPE == 'accurate_cpu':
+        DET_MODEL_PATH = os.path.join(DET_MODEL_BASE, MODEL_VERSION, 'ch_det_fast')
+        REC_MODEL_PATH = os.path.join(REC_MODEL_BASE, MODEL_VERSION, f'{REC_CHAR_TYPE}_rec')
+    # 快速INT8模式使用quantize.py量化后的轻量模型(模型目录名加_int8后缀)，没有量化模型时使用轻量模型
+    elif MODE_TYPE == 'fast_int8':
+        DET_MODEL_PATH = os.path.join(DET_MODEL_BASE, MODEL_VERSION, 'ch_det_fast_int8')
+        if not os.path.exists(DET_MODEL_PATH):
+            DET_MODEL_PATH = os.path.join(DET_MODEL_BASE, MODEL_VERSION, 'ch_det_fast')
+        REC_MODEL_PATH = os.path.join(REC_MODEL_BASE, MODEL_VERSION, f'{REC_CHAR_TYPE}_rec_fast_int8')
+        if not os.path.exists(REC_MODEL_PATH):
+            REC_MODEL_PATH = os.path.join(REC_MODEL_BASE, MODEL_VERSION, f'{REC_CHAR_TYPE}_rec_fast')
     else:
         DET_MODEL_PATH = os.path.join(DET_MODEL_BASE, MODEL_VERSION, 'ch_det')
         REC_MODEL_PATH = os.path.join(REC_MODEL_BASE, MODEL_VERSION, f'{REC_CHAR_TYPE}_rec')
@@ -199,6 +211,30 @@ if REC_CHAR_TYPE in MULTI_LANG:
     if 'inference.pdiparams' not in (os.listdir(DET_MODEL_PATH)):
         fs = Filesplit()
         fs.merge(input_dir=DET_MODEL_PATH)
+
+# 推理精度，检测与识别模型分别根据各自的路径判断，使用INT8量化模型时在CPU上通过MKLDNN以INT8推理
+# (量化模型不存在时会回退到fast模型，此时检测与识别的精度可能不同)
+DET_INFERENCE_PRECISION = 'int8' if DET_MODEL_PATH.endswith('_int8') else 'fp32'
+REC_INFERENCE_PRECISION = 'int8' if REC_MODEL_PATH.endswith('_int8') else 'fp32'
+
+# 推理后端，在settings.ini中设置 Backend = paddle 或 onnx，默认为paddle
+INFERENCE_BACKEND = settings_config['DEFAULT'].get('Backend', 'paddle').strip().lower()
+# ONNX模型与Paddle模型放在同一目录下，文件名为inference.onnx，可以使用paddle2onnx导出：
+# paddle2onnx --model_dir models/V4/ch_det --model_filename inference.pdmodel --params_filename inference.pdiparams
+#             --save_file models/V4/ch_det/inference.onnx
+DET_ONNX_MODEL_PATH = os.path.join(DET_MODEL_PATH, 'inference.onnx')
+REC_ONNX_MODEL_PATH = os.path.join(REC_MODEL_PATH, 'inference.onnx')
+# 检测与识别模型都有ONNX文件时才使用ONNX Runtime，否则回退到Paddle
+# fast_int8模式的量化模型只有Paddle格式，且依赖MKLDNN的INT8推理，始终使用Paddle
+USE_ONNX = False
+if INFERENCE_BACKEND == 'onnx':
+    if MODE_TYPE == 'fast_int8':
+        print('ONNX backend does not support fast_int8 mode (int8 models are paddle only), fall back to paddle')
+    elif os.path.exists(DET_ONNX_MODEL_PATH) and os.path.exists(REC_ONNX_MODEL_PATH):
+        USE_ONNX = True
+    else:
+        print(f'ONNX model not found in {os.path.dirname(DET_ONNX_MODEL_PATH)} or '
+              f'{os.path.dirname(REC_ONNX_MODEL_PATH)}, fall back to paddle')
 # ×××××××××××××××××××× [不要改]读取语言、模型路径、字典路径 end ××××××××××××××××××××
 
 
@@ -207,16 +243,76 @@ if REC_CHAR_TYPE in MULTI_LANG:
 GENERATE_TXT = True
 
 # 每张图中同时识别6个文本框中的文本，GPU显存越大，该数值可以设置越大
+# OCR进程批量识别时，同一批视频帧的文本框会汇总后再按该数值分批
 REC_BATCH_NUM = 6
 # DB算法每个batch识别多少张，默认为10
 MAX_BATCH_SIZE = 10
 
+# 每个OCR进程使用CPU推理时的线程数
+CPU_THREADS = 10
+# DB检测后处理是否只输出水平矩形框：用连通域代替轮廓、积分图计算得分、解析计算外扩距离，速度更快，
+# 字幕均为水平文本时结果与默认后处理一致，视频中有倾斜的文本需要识别时请关闭
+DET_AXIS_ALIGNED_BOX = False
+# 使用ONNX Runtime时单个算子内部的线程数，设置为0时使用CPU_THREADS
+ONNX_INTRA_OP_THREADS = 0
+# 使用ONNX Runtime时并行执行算子的线程数，为1时顺序执行
+ONNX_INTER_OP_THREADS = 1
+# ONNX Runtime图优化级别: disable, basic, extended, all
+ONNX_GRAPH_OPTIMIZATION_LEVEL = 'all'
+# 使用CPU推理时是否开启MKLDNN加速，默认只在accurate_cpu模式以及需要MKLDNN执行INT8推理的fast_int8模式下开启，
+# 其他模式可以手动改为True尝试
+ENABLE_MKLDNN = MODE_TYPE in ('accurate_cpu', 'fast_int8')
+# OCR进程数量，设置为0时根据CPU核数与CPU_THREADS自动计算，使用GPU时固定为1
+OCR_WORKER_NUM = 1
+# 多个OCR进程时，每次连续分发给同一个进程的任务数，越大越有利于复用上一帧的识别结果
+# 使用共享内存传输视频帧时不超过SHARED_FRAME_SLOTS // OCR进程数，避免一个进程的任务占满所有槽位
+OCR_WORKER_BLOCK_SIZE = 64
+
+# 批量提取时同时处理的视频数量，设置为0时根据CPU核数与CPU_THREADS自动计算
+BATCH_JOBS = 0
+# 批量提取时每个视频任务预计占用的内存(GB)，用于根据内存预算限制同时处理的视频数量
+BATCH_JOB_MEMORY_GB = 2
+
+# 分段并行提取单个视频时的段数(进程数)，设置为0时根据CPU核数与CPU_THREADS自动计算
+SEGMENT_JOBS = 0
+# 分段并行提取时每一段向前多处理的时长(秒)，用于预热解码与字幕变化检测，重叠部分的结果以前一段为准
+SEGMENT_OVERLAP = 2
+
+# OCR进程每次批量检测的视频帧数量，需要小于SHARED_FRAME_SLOTS
+OCR_BATCH_SIZE = 4
+# 等待凑满一个batch的最长时间(秒)，超时后立即识别已收到的帧
+OCR_BATCH_TIMEOUT = 0.1
+
+# 共享内存中用于向OCR进程传输视频帧的槽位数量，设置为0则由OCR进程根据帧号自行解码视频
+SHARED_FRAME_SLOTS = 16
+
 # 默认字幕出现区域为下方
 DEFAULT_SUBTITLE_AREA = SubtitleArea.UNKNOWN
 
 # 每一秒抓取多少帧进行OCR识别
 EXTRACT_FREQUENCY = 3
 
+# 指定字幕区域时是否调用videoSubFinder查找字幕帧，为False时在当前进程中查找字幕区域发生变化的帧，不再生成RGBImages
+USE_VSF = True
+# 查找字幕帧时，字幕区域中文字边缘像素的最小占比，低于该值的字幕段视为没有字幕
+SUBFINDER_MIN_EDGE_DENSITY = 0.005
+# 查找字幕帧时，字幕区域的文字边缘图按列分块比较，某一块中变化像素的占比超过该值才开始新的字幕段
+SUBFINDER_EDGE_CHANGE_THRESHOLD = 0.05
+# 查找字幕帧时每个字幕段的最短时长(秒)，画面持续变化时每秒最多识别1 / 该值次
+SUBFINDER_MIN_SEGMENT_DURATION = 0.5
+
+# 是否在OCR之前检测字幕区域的变化，字幕区域没有变化的帧直接复用上一帧的识别结果
+USE_FRAME_DIFF_GATE = True
+# 字幕区域变化阈值，降采样后变化像素的占比超过该值才重新识别，值越小越严格
+FRAME_DIFF_THRESHOLD = 0.002
+
+# 是否使用自适应采样代替按EXTRACT_FREQUENCY定时抽帧，字幕区域变化时二分查找准确的字幕开始/结束帧，每条字幕只识别一次
+ADAPTIVE_SAMPLING = False
+# 自适应采样时，字幕区域发生变化后的采样间隔(帧)
+ADAPTIVE_MIN_INTERVAL = 2
+# 自适应采样时，字幕区域稳定后的最大采样间隔(秒)，短于该间隔且前后画面相同的字幕可能被漏掉
+ADAPTIVE_MAX_INTERVAL = 1
+
 # 容忍的像素点偏差
 PIXEL_TOLERANCE_Y = 50  # 允许检测框纵向偏差50个像素点
 PIXEL_TOLERANCE_X = 100  # 允许检测框横向偏差100个像素点
@@ -226,6 +322,8 @@ SUBTITLE_AREA_DEVIATION_PIXEL = 50
 
 # 最有可能出现的水印区域
 WATERMARK_AREA_NUM = 5
+# 判断水印区域时随机抽取的视频帧数量，水印(台标)在不同帧中的画面几乎不变，相似度越接近1越可能是水印
+WATERMARK_SAMPLE_FRAMES = 8
 
 # 文本相似度阈值
 # 用于去重时判断两行字幕是不是同一行，这个值越高越严格。 e.g. 0.99表示100个字里面有99各个字一模一样才算相似
@@ -239,12 +337,25 @@ DROP_SCORE = 0.75
 # 字幕区域允许偏差, 0为不允许越界, 0.03表示可以越界3%
 SUB_AREA_DEVIATION_RATE = 0
 
+# 指定了字幕区域时，是否只在字幕区域内进行文本检测与识别(先裁剪再识别)
+SUB_AREA_ROI = True
+# 裁剪字幕区域时向外扩展的像素，避免贴边的文字被截断
+SUB_AREA_ROI_MARGIN = 20
+
+# 逐帧检测字幕是否存在时，检测前图像最长边的限制，字幕区域较窄，可以比识别时的960小
+PRESENCE_DET_LIMIT_SIDE_LEN = 640
+
 # 输出丢失的字幕帧, 仅简体中文,繁体中文,日文,韩语有效, 默认将调试信息输出到: 视频路径/loss
 DEBUG_OCR_LOSS = False
 
 # 是否不删除缓存数据，以方便调试
 DEBUG_NO_DELETE_CACHE = False
 
+# 是否记录提取进度检查点，程序被中断后重新运行同一个视频时从最后提交的帧继续
+ENABLE_CHECKPOINT = True
+# 每识别多少帧提交一次检查点
+CHECKPOINT_INTERVAL = 1000
+
 # 是否删除空时间轴
 DELETE_EMPTY_TIMESTAMP = True
 
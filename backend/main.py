@@ -6,16 +6,16 @@
 @desc: 主程序入口文件
 """
 import os
+import glob
+import hashlib
+import json
 import random
 import shutil
-from collections import Counter, namedtuple
-import unicodedata
+from collections import Counter
 from threading import Thread
 from pathlib import Path
 import cv2
 from Levenshtein import ratio
-from PIL import Image
-from numpy import average, dot, linalg
 from tqdm import tqdm
 import sys
 
@@ -25,8 +25,19 @@ import config
 from tools import reformat
 from tools.infer import utility
 from tools.infer.predict_det import TextDetector
-from tools.ocr import OcrRecogniser, get_coordinates
+from tools.ocr import get_coordinates, set_inference_backend
+from tools.predictor_pool import predictor_pool, get_ocr_recogniser
 from tools import subtitle_ocr
+from tools.frame_transport import SharedFrameRing
+from tools.change_detector import SubtitleChangeDetector
+from tools.adaptive_sampler import AdaptiveFrameSampler
+from tools.subtitle_finder import SubtitleFrameFinder
+from tools.raw_store import RawSubtitleStore
+from tools.subtitle_dedup import SubtitleDeduplicator
+from tools.coordinate_cluster import cluster_coordinates
+from tools.image_similarity import compute_image_similarity_batch
+from tools.frame_index import FramePtsIndex
+from tools.checkpoint import SegmentJournal
 import threading
 import platform
 import multiprocessing
@@ -39,12 +50,23 @@ class SubtitleDetect:
     文本框检测类，用于检测视频帧中是否存在文本框
     """
 
-    def __init__(self):
+    def __init__(self, det_limit_side_len=None):
+        """
+        :param det_limit_side_len 检测前图像最长边的限制，为None时使用默认值，越小检测越快
+        """
         # 获取参数对象
         importlib.reload(config)
         args = utility.parse_args()
         args.det_algorithm = 'DB'
         args.det_model_dir = config.DET_MODEL_PATH
+        args.det_db_axis_aligned = config.DET_AXIS_ALIGNED_BOX
+        args.use_gpu = config.USE_GPU
+        args.cpu_threads = config.CPU_THREADS
+        args.enable_mkldnn = config.ENABLE_MKLDNN and not config.USE_GPU
+        args.det_precision = config.DET_INFERENCE_PRECISION
+        if det_limit_side_len is not None:
+            args.det_limit_side_len = det_limit_side_len
+        set_inference_backend(args)
         self.text_detector = TextDetector(args)
 
     def detect_subtitle(self, img):
@@ -57,21 +79,41 @@ class SubtitleExtractor:
     视频字幕提取类
     """
 
-    def __init__(self, vd_path, sub_area=None):
+    def __init__(self, vd_path, sub_area=None, interactive=True, ocr_in_process=False, cpu_threads=None,
+                 frame_range=None):
+        """
+        :param vd_path 视频路径
+        :param sub_area 用户指定的字幕区域 (ymin, ymax, xmin, xmax)
+        :param interactive 为False时不询问用户，水印与非字幕区域均不删除(批量提取时使用)
+        :param ocr_in_process 为True时在当前进程中进行OCR识别，复用模型池中已加载的模型
+        :param cpu_threads 每个OCR进程的CPU推理线程数，为None时使用配置文件中的值
+        :param frame_range 只提取该范围内的视频帧 (开始帧号, 结束帧号)，帧号从1开始，包含两端，结束帧号为None时
+        提取到视频结束(分段并行提取时使用)
+        """
         importlib.reload(config)
         # 线程锁
         self.lock = threading.RLock()
         # 用户指定的字幕区域位置
         self.sub_area = sub_area
-        # 创建字幕检测对象
-        self.sub_detector = SubtitleDetect()
+        # 是否需要询问用户
+        self.interactive = interactive
+        # 是否在当前进程中进行OCR识别
+        self.ocr_in_process = ocr_in_process
+        # OCR的CPU推理线程数
+        self.cpu_threads = cpu_threads
+        # 提取的视频帧范围
+        self.frame_range = tuple(frame_range) if frame_range is not None else None
         # 视频路径
         self.video_path = vd_path
         self.video_cap = cv2.VideoCapture(vd_path)
         # 通过视频路径获取视频名称
         self.vd_name = Path(self.video_path).stem
-        # 临时存储文件夹
-        self.temp_output_dir = os.path.join(os.path.dirname(config.BASE_DIR), 'output', str(self.vd_name))
+        # 临时存储文件夹，名称加上视频绝对路径的哈希，不同目录下的同名视频同时提取时不会共用同一个文件夹；
+        # 分段提取时每一段使用单独的文件夹
+        path_hash = hashlib.md5(os.path.abspath(self.video_path).encode('utf-8')).hexdigest()[:8]
+        self.temp_output_dir = os.path.join(os.path.dirname(config.BASE_DIR), 'output', f'{self.vd_name}_{path_hash}')
+        if self.frame_range is not None:
+            self.temp_output_dir += f'_{self.frame_range[0]}_{self.frame_range[1] or "end"}'
         # 视频帧总数
         self.frame_count = self.video_cap.get(cv2.CAP_PROP_FRAME_COUNT)
         # 视频帧率
@@ -94,8 +136,20 @@ class SubtitleExtractor:
         self.use_vsf = False
         # 定义vsf的字幕输出路径
         self.vsf_subtitle = os.path.join(self.subtitle_output_dir, 'raw_vsf.srt')
-        # 提取的原始字幕文本存储路径
-        self.raw_subtitle_path = os.path.join(self.subtitle_output_dir, 'raw.txt')
+        # 提取的原始字幕记录存储路径(二进制，OCR进程追加写入)
+        self.raw_subtitle_path = os.path.join(self.subtitle_output_dir, 'raw.bin')
+        # 原始字幕记录，OCR完成后从raw_subtitle_path中读取，后处理均在其上进行
+        self.raw_store = None
+        # 提取视频帧时记录的帧时间戳索引，生成字幕时按帧号查询时间
+        self.frame_pts = FramePtsIndex(self.frame_count)
+        # 帧时间戳索引的存储路径
+        self.frame_pts_path = os.path.join(self.subtitle_output_dir, 'frame_pts.npy')
+        # 检查点信息的存储路径，记录视频、识别参数以及可以继续提取的帧号
+        self.checkpoint_path = os.path.join(self.subtitle_output_dir, 'checkpoint.json')
+        # 之前的运行中已经提交的原始字幕记录
+        self.resume_store_path = os.path.join(self.subtitle_output_dir, 'raw_resume.bin')
+        # 从该帧之后继续提取，为0时从头开始
+        self.resume_frame_no = 0
         # 自定义ocr对象
         self.ocr = None
         # 打印识别语言与识别模式
@@ -116,9 +170,21 @@ class SubtitleExtractor:
         self.subtitle_ocr_task_queue = None
         # 字幕OCR进度队列
         self.subtitle_ocr_progress_queue = None
+        # 字幕OCR进程
+        self.subtitle_ocr_process = None
+        # 向OCR进程传输视频帧的共享内存帧环
+        self.frame_ring = None
         # vsf运行状态
         self.vsf_running = False
 
+    @property
+    def sub_detector(self):
+        """
+        从模型池中获取字幕检测对象，同一进程中处理多个视频时只加载一次，只在需要检测时才加载
+        """
+        return predictor_pool.get(('det', config.DET_MODEL_PATH, config.PRESENCE_DET_LIMIT_SIDE_LEN, config.USE_ONNX),
+                                  lambda: SubtitleDetect(config.PRESENCE_DET_LIMIT_SIDE_LEN))
+
     def run(self):
         """
         运行整个提取视频的步骤
@@ -126,6 +192,16 @@ class SubtitleExtractor:
         # 记录开始运行的时间
         start_time = time.time()
         self.lock.acquire()
+        self.extract_raw_subtitles()
+        self.generate_subtitles(start_time)
+        self.lock.release()
+        if config.GENERATE_TXT:
+            self.srt2txt(os.path.join(os.path.splitext(self.video_path)[0] + '.srt'))
+
+    def extract_raw_subtitles(self):
+        """
+        提取视频帧并进行OCR识别，识别完成后原始字幕记录保存在self.raw_store中
+        """
         # 重置进度条
         self.update_progress(ocr=0, frame_extract=0)
         # 打印视频帧数与帧率
@@ -136,30 +212,59 @@ class SubtitleExtractor:
         print(f'{os.path.basename(os.path.dirname(config.REC_MODEL_PATH))}-{os.path.basename(config.REC_MODEL_PATH)}')
         # 打印视频帧提取开始提示
         print(config.interface_config['Main']['StartProcessFrame'])
+        # 读取上一次运行被中断时的检查点
+        self._load_checkpoint()
         # 创建一个字幕OCR识别进程
         subtitle_ocr_process = self.start_subtitle_ocr_async()
-        if self.sub_area is not None:
+        # CPU精准模式：逐帧比较字幕区域，只在字幕区域发生变化的帧上检测
+        if config.MODE_TYPE == 'accurate_cpu':
+            self.extract_frame_by_presence()
+        elif self.sub_area is not None:
             if platform.system() in ['Windows', 'Linux']:
                 # 使用GPU且使用accurate模式时才开放此方法：
                 if config.USE_GPU and config.MODE_TYPE == 'accurate':
                     self.extract_frame_by_det()
-                else:
+                elif config.USE_VSF and self.frame_range is None:
                     self.extract_frame_by_vsf()
+                else:
+                    self.extract_frame_by_finder()
             else:
-                self.extract_frame_by_fps()
+                self.extract_frame_by_sampling()
         else:
-            self.extract_frame_by_fps()
+            self.extract_frame_by_sampling()
 
+        # 保存提取过程中记录的帧时间戳
+        self.frame_pts.save(self.frame_pts_path)
         # 往字幕OCR任务队列中，添加OCR识别任务结束标志
         # 任务格式为：(total_frame_count总帧数, current_frame_no当前帧, dt_box检测框, rec_res识别结果, 当前帧时间， subtitle_area字幕区域)
         self.subtitle_ocr_task_queue.put((self.frame_count, -1, None, None, None, None))
         # 等待子线程完成
         subtitle_ocr_process.join()
+        # 释放共享内存
+        if self.frame_ring is not None:
+            self.frame_ring.close()
+            self.frame_ring.unlink()
+            self.frame_ring = None
+        # 读取OCR进程输出的原始字幕记录
+        self.raw_store = RawSubtitleStore.load(self.raw_subtitle_path) \
+            if os.path.exists(self.raw_subtitle_path) else RawSubtitleStore()
+        # 加上之前的运行中已经提交的记录
+        if self.resume_frame_no > 0 and os.path.exists(self.resume_store_path):
+            resume_store = RawSubtitleStore.load(self.resume_store_path)
+            resume_store.extend(self.raw_store)
+            self.raw_store = resume_store
         # 打印完成提示
         print(config.interface_config['Main']['FinishProcessFrame'])
         print(config.interface_config['Main']['FinishFindSub'])
 
-        if self.sub_area is None:
+    def generate_subtitles(self, start_time=None):
+        """
+        过滤self.raw_store中的原始字幕记录，去重后生成字幕文件
+        :param start_time 开始提取的时间，用于打印总耗时
+        """
+        if start_time is None:
+            start_time = time.time()
+        if self.sub_area is None and self.interactive:
             print(config.interface_config['Main']['StartDetectWaterMark'])
             # 询问用户视频是否有水印区域
             user_input = input(config.interface_config['Main']['checkWaterMark']).strip()
@@ -169,7 +274,7 @@ class SubtitleExtractor:
             else:
                 print('-----------------------------')
 
-        if self.sub_area is None:
+        if self.sub_area is None and self.interactive:
             print(config.interface_config['Main']['StartDeleteNonSub'])
             self.filter_scene_text()
             print(config.interface_config['Main']['FinishDeleteNonSub'])
@@ -188,11 +293,10 @@ class SubtitleExtractor:
         print(config.interface_config['Main']['FinishGenerateSub'], f"{round(time.time() - start_time, 2)}s")
         self.update_progress(ocr=100, frame_extract=100)
         self.isFinished = True
+        # 字幕已经生成，不再需要检查点
+        self._discard_checkpoint()
         # 删除缓存文件
         self.empty_cache()
-        self.lock.release()
-        if config.GENERATE_TXT:
-            self.srt2txt(os.path.join(os.path.splitext(self.video_path)[0] + '.srt'))
 
     def extract_frame_by_fps(self):
         """
@@ -200,28 +304,210 @@ class SubtitleExtractor:
         """
         # 删除缓存
         self.__delete_frame_cache()
+        # 字幕区域变化检测，区域没有变化的帧复用上一帧的OCR结果
+        change_detector = SubtitleChangeDetector(config.FRAME_DIFF_THRESHOLD) if config.USE_FRAME_DIFF_GATE else None
+        roi_sub_area = self.sub_area if config.SUB_AREA_ROI else None
         # 当前视频帧的帧号
-        current_frame_no = 0
+        current_frame_no = self._seek_resume_frame()
         while self.video_cap.isOpened():
-            ret, frame = self.video_cap.read()
+            ret, frame = self._read_frame(current_frame_no)
             # 如果读取视频帧失败（视频读到最后一帧）
             if not ret:
                 break
             # 读取视频帧成功
             else:
                 current_frame_no += 1
-                # subtitle_ocr_task_queue: (total_frame_count总帧数, current_frame_no当前帧, dt_box检测框, rec_res识别结果, 当前帧时间，subtitle_area字幕区域)
-                task = (self.frame_count, current_frame_no, None, None, None, self.default_subtitle_area)
+                self._record_frame_pts(current_frame_no)
+                region, _ = subtitle_ocr.crop_ocr_region(frame, roi_sub_area, self.default_subtitle_area,
+                                                         config.SUB_AREA_ROI_MARGIN)
+                if change_detector is not None and change_detector.is_same(region):
+                    task = subtitle_ocr.OcrTask(self.frame_count, current_frame_no, None, None, None,
+                                                self.default_subtitle_area, None, True)
+                else:
+                    # subtitle_ocr_task_queue: (total_frame_count总帧数, current_frame_no当前帧, dt_box检测框, rec_res识别结果, 当前帧时间，subtitle_area字幕区域, 共享内存帧引用)
+                    task = subtitle_ocr.OcrTask(self.frame_count, current_frame_no, None, None, None,
+                                                self.default_subtitle_area, self._share_frame(frame))
                 self.subtitle_ocr_task_queue.put(task)
                 # 跳过剩下的帧
                 for i in range(int(self.fps // config.EXTRACT_FREQUENCY) - 1):
-                    ret, _ = self.video_cap.read()
+                    ret, _ = self._read_frame(current_frame_no)
                     if ret:
                         current_frame_no += 1
+                        self._record_frame_pts(current_frame_no)
                         # 更新进度条
                         self.update_progress(frame_extract=(current_frame_no / self.frame_count) * 100)
 
         self.video_cap.release()
+        if change_detector is not None:
+            print(f'Frame diff gate: {change_detector.stats()}')
+
+    def extract_frame_by_sampling(self):
+        """
+        按配置选择定时抽帧或自适应采样
+        """
+        if config.ADAPTIVE_SAMPLING:
+            self.extract_frame_by_adaptive()
+        else:
+            self.extract_frame_by_fps()
+
+    def extract_frame_by_adaptive(self):
+        """
+        根据字幕区域的变化自适应采样，二分查找字幕出现与消失的准确帧号，每个字幕段只识别开始帧，
+        结束帧复用开始帧的识别结果
+        """
+        # 删除缓存
+        self.__delete_frame_cache()
+        sampler = AdaptiveFrameSampler(SubtitleChangeDetector(config.FRAME_DIFF_THRESHOLD),
+                                       config.ADAPTIVE_MIN_INTERVAL,
+                                       max(int(self.fps * config.ADAPTIVE_MAX_INTERVAL), 1))
+        roi_sub_area = self.sub_area if config.SUB_AREA_ROI else None
+        # 当前视频帧的帧号
+        current_frame_no = self._seek_resume_frame()
+        # 当前字幕段的开始帧号
+        segment_start_no = None
+        while self.video_cap.isOpened():
+            ret, frame = self._read_frame(current_frame_no)
+            # 如果读取视频帧失败（视频读到最后一帧）
+            if not ret:
+                break
+            current_frame_no += 1
+            self._record_frame_pts(current_frame_no)
+            region, origin = subtitle_ocr.crop_ocr_region(frame, roi_sub_area, self.default_subtitle_area,
+                                                          config.SUB_AREA_ROI_MARGIN)
+            for start_no, start_region, start_origin in sampler.push(current_frame_no, region, origin):
+                segment_start_no = self._put_segment(segment_start_no, start_no, start_region, start_origin)
+            self.update_progress(frame_extract=(current_frame_no / self.frame_count) * 100)
+        for start_no, start_region, start_origin in sampler.finish():
+            segment_start_no = self._put_segment(segment_start_no, start_no, start_region, start_origin)
+        # 最后一个字幕段持续到视频结束
+        self._close_segment(segment_start_no, current_frame_no)
+        self.video_cap.release()
+        print(f'Adaptive sampling: {sampler.stats()}')
+
+    def extract_frame_by_presence(self):
+        """
+        CPU上的检测模式：自适应采样找出字幕区域发生变化的帧，只在这些帧上检测字幕区域是否有文本，
+        有文本时将检测框随任务一起发送给OCR进程，OCR进程只需识别
+        """
+        # 删除缓存
+        self.__delete_frame_cache()
+        sampler = AdaptiveFrameSampler(SubtitleChangeDetector(config.FRAME_DIFF_THRESHOLD),
+                                       config.ADAPTIVE_MIN_INTERVAL,
+                                       max(int(self.fps * config.ADAPTIVE_MAX_INTERVAL), 1))
+        roi_sub_area = self.sub_area if config.SUB_AREA_ROI else None
+        # 当前视频帧的帧号
+        current_frame_no = self._seek_resume_frame()
+        # 当前字幕段的开始帧号，没有字幕时为None
+        segment_start_no = None
+        # 检测过的帧数与检测到字幕的帧数
+        detected, with_subtitle = 0, 0
+        tbar = tqdm(total=int(self.frame_count), unit='f', position=0, file=sys.__stdout__)
+
+        def on_change(start_no, region, origin):
+            nonlocal segment_start_no, detected, with_subtitle
+            dt_boxes, _ = self.sub_detector.detect_subtitle(region)
+            detected += 1
+            dt_box = subtitle_ocr.translate_boxes(dt_boxes.tolist(), origin) if dt_boxes is not None else []
+            if not self._has_subtitle(dt_box):
+                # 字幕消失，结束上一个字幕段
+                self._close_segment(segment_start_no, start_no - 1)
+                segment_start_no = None
+                return
+            with_subtitle += 1
+            segment_start_no = self._put_segment(segment_start_no, start_no, region, origin, dt_box)
+
+        while self.video_cap.isOpened():
+            ret, frame = self._read_frame(current_frame_no)
+            # 如果读取视频帧失败（视频读到最后一帧）
+            if not ret:
+                break
+            current_frame_no += 1
+            self._record_frame_pts(current_frame_no)
+            tbar.update(1)
+            region, origin = subtitle_ocr.crop_ocr_region(frame, roi_sub_area, self.default_subtitle_area,
+                                                          config.SUB_AREA_ROI_MARGIN)
+            for change in sampler.push(current_frame_no, region, origin):
+                on_change(*change)
+            self.update_progress(frame_extract=(current_frame_no / self.frame_count) * 100)
+        for change in sampler.finish():
+            on_change(*change)
+        self._close_segment(segment_start_no, current_frame_no)
+        tbar.close()
+        self.video_cap.release()
+        print(f'Presence detection: {sampler.stats()}, detected: {detected}, with subtitle: {with_subtitle}')
+
+    def extract_frame_by_finder(self):
+        """
+        在当前进程中查找字幕区域发生变化的帧(代替videoSubFinder)，包含文字的字幕段直接加入ocr识别任务队列
+        """
+        # 删除缓存
+        self.__delete_frame_cache()
+        finder = SubtitleFrameFinder(min_edge_density=config.SUBFINDER_MIN_EDGE_DENSITY,
+                                     change_threshold=config.SUBFINDER_EDGE_CHANGE_THRESHOLD,
+                                     min_segment_frames=max(int(self.fps * config.SUBFINDER_MIN_SEGMENT_DURATION), 1))
+        roi_sub_area = self.sub_area if config.SUB_AREA_ROI else None
+        # 当前视频帧的帧号
+        current_frame_no = self._seek_resume_frame()
+        # 当前字幕段的开始帧号，没有字幕时为None
+        segment_start_no = None
+
+        def on_change(start_no, region, origin, has_text):
+            nonlocal segment_start_no
+            if has_text:
+                segment_start_no = self._put_segment(segment_start_no, start_no, region, origin)
+            else:
+                self._close_segment(segment_start_no, start_no - 1)
+                segment_start_no = None
+
+        while self.video_cap.isOpened():
+            ret, frame = self._read_frame(current_frame_no)
+            # 如果读取视频帧失败（视频读到最后一帧）
+            if not ret:
+                break
+            current_frame_no += 1
+            self._record_frame_pts(current_frame_no)
+            region, origin = subtitle_ocr.crop_ocr_region(frame, roi_sub_area, self.default_subtitle_area,
+                                                          config.SUB_AREA_ROI_MARGIN)
+            for change in finder.push(current_frame_no, region, origin):
+                on_change(*change)
+            self.update_progress(frame_extract=(current_frame_no / self.frame_count) * 100)
+        for change in finder.finish():
+            on_change(*change)
+        self._close_segment(segment_start_no, current_frame_no)
+        self.video_cap.release()
+        print(f'Subtitle frame finder: {finder.stats()}')
+
+    def _has_subtitle(self, dt_box):
+        """
+        判断检测框(原视频帧坐标)中是否有落在字幕区域内的文本
+        """
+        if self.sub_area is None:
+            return len(dt_box) > 0
+        s_ymin, s_ymax, s_xmin, s_xmax = self.sub_area
+        for xmin, xmax, ymin, ymax in get_coordinates(dt_box):
+            if s_xmin <= xmin and xmax <= s_xmax and s_ymin <= ymin and ymax <= s_ymax:
+                return True
+        return False
+
+    def _close_segment(self, segment_start_no, end_no):
+        """
+        字幕段在end_no结束，为其结束帧添加复用开始帧识别结果的任务
+        """
+        if segment_start_no is not None and end_no > segment_start_no:
+            self.subtitle_ocr_task_queue.put(subtitle_ocr.OcrTask(self.frame_count, end_no, None, None, None,
+                                                                  self.default_subtitle_area, None, True))
+
+    def _put_segment(self, segment_start_no, start_no, region, origin, dt_box=None):
+        """
+        上一个字幕段在start_no的前一帧结束，并为新字幕段的开始帧添加OCR任务
+        :param dt_box 已经检测到的检测框(原视频帧坐标)，不为None时OCR进程只识别不检测
+        :return 新字幕段的开始帧号
+        """
+        self._close_segment(segment_start_no, start_no - 1)
+        self.subtitle_ocr_task_queue.put(subtitle_ocr.OcrTask(self.frame_count, start_no, dt_box, None, None,
+                                                              self.default_subtitle_area,
+                                                              self._share_region(region, origin)))
+        return start_no
 
     def extract_frame_by_det(self):
         """
@@ -231,7 +517,7 @@ class SubtitleExtractor:
         self.__delete_frame_cache()
 
         # 当前视频帧的帧号
-        current_frame_no = 0
+        current_frame_no = self._seek_resume_frame()
         frame_lru_list = []
         frame_lru_list_max_size = 2
         ocr_args_list = []
@@ -244,20 +530,25 @@ class SubtitleExtractor:
         start_end_frame_no = []
         start_frame = None
         if self.ocr is None:
-            self.ocr = OcrRecogniser()
+            self.ocr = get_ocr_recogniser(cpu_threads=self.cpu_threads, owner='extractor')
+        roi_sub_area = self.sub_area if config.SUB_AREA_ROI else None
         while self.video_cap.isOpened():
-            ret, frame = self.video_cap.read()
+            ret, frame = self._read_frame(current_frame_no)
             # 如果读取视频帧失败（视频读到最后一帧）
             if not ret:
                 break
             # 读取视频帧成功
             current_frame_no += 1
+            self._record_frame_pts(current_frame_no)
             tbar.update(1)
+            # 只在字幕区域内检测，检测框直接用于识别，每帧最多检测一次
+            frame, origin = subtitle_ocr.crop_ocr_region(frame, roi_sub_area, self.default_subtitle_area,
+                                                         config.SUB_AREA_ROI_MARGIN)
             dt_boxes, elapse = self.sub_detector.detect_subtitle(frame)
             has_subtitle = False
             if self.sub_area is not None:
                 s_ymin, s_ymax, s_xmin, s_xmax = self.sub_area
-                coordinate_list = get_coordinates(dt_boxes.tolist())
+                coordinate_list = get_coordinates(subtitle_ocr.translate_boxes(dt_boxes.tolist(), origin))
                 if coordinate_list:
                     for coordinate in coordinate_list:
                         xmin, xmax, ymin, ymax = coordinate
@@ -277,7 +568,7 @@ class SubtitleExtractor:
                 # 判断是字幕头还是尾
                 if is_finding_start_frame_no:
                     start_frame_no = current_frame_no
-                    dt_box, rec_res = self.ocr.predict(frame)
+                    dt_box, rec_res = self._predict_region(frame, dt_boxes, origin)
                     area_text1 = "".join(self.__get_area_text((dt_box, rec_res)))
                     if start_frame_no not in compare_ocr_result_cache.keys():
                         compare_ocr_result_cache[current_frame_no] = {'text': area_text1, 'dt_box': dt_box, 'rec_res': rec_res}
@@ -299,7 +590,8 @@ class SubtitleExtractor:
                 # 如果在找结束帧的时候
                 if is_finding_end_frame_no:
                     # 判断该帧与头帧ocr内容是否一致,若不一致则找到尾，尾巴为前一帧
-                    if not self._compare_ocr_result(compare_ocr_result_cache, None, start_frame_no, frame, current_frame_no):
+                    if not self._compare_ocr_result(compare_ocr_result_cache, None, start_frame_no, frame, current_frame_no,
+                                                    dt_boxes, origin):
                         is_finding_end_frame_no = False
                         is_finding_start_frame_no = True
                         end_frame_no = current_frame_no - 1
@@ -325,8 +617,8 @@ class SubtitleExtractor:
 
             while len(ocr_args_list) > 1:
                 total_frame_count, ocr_info_frame_no = ocr_args_list.pop(0)
-                if current_frame_no in compare_ocr_result_cache:
-                    predict_result = compare_ocr_result_cache[current_frame_no]
+                if ocr_info_frame_no in compare_ocr_result_cache:
+                    predict_result = compare_ocr_result_cache[ocr_info_frame_no]
                     dt_box, rec_res = predict_result['dt_box'], predict_result['rec_res']
                 else:
                     dt_box, rec_res = None, None
@@ -338,8 +630,8 @@ class SubtitleExtractor:
 
         while len(ocr_args_list) > 0:
             total_frame_count, ocr_info_frame_no = ocr_args_list.pop(0)
-            if current_frame_no in compare_ocr_result_cache:
-                predict_result = compare_ocr_result_cache[current_frame_no]
+            if ocr_info_frame_no in compare_ocr_result_cache:
+                predict_result = compare_ocr_result_cache[ocr_info_frame_no]
                 dt_box, rec_res = predict_result['dt_box'], predict_result['rec_res']
             else:
                 dt_box, rec_res = None, None
@@ -353,6 +645,11 @@ class SubtitleExtractor:
        通过调用videoSubFinder获取字幕帧
        """
         self.use_vsf = True
+        # videoSubFinder每次都处理整个视频，无法从检查点继续
+        if self.resume_frame_no > 0:
+            self.resume_frame_no = 0
+            if os.path.exists(self.resume_store_path):
+                os.remove(self.resume_store_path)
 
         def count_process():
             duration_ms = (self.frame_count / self.fps) * 1000
@@ -363,6 +660,7 @@ class SubtitleExtractor:
                 # 如果还没有rgb_images_path说明vsf还没处理完
                 if not os.path.exists(rgb_images_path):
                     # 继续等待
+                    time.sleep(0.5)
                     continue
                 try:
                     # 将列表按文件名排序
@@ -388,6 +686,7 @@ class SubtitleExtractor:
                 # 文件被清理了
                 except FileNotFoundError:
                     return
+                time.sleep(0.5)
 
         def vsf_output(out, ):
             duration_ms = (self.frame_count / self.fps) * 1000
@@ -466,20 +765,26 @@ class SubtitleExtractor:
         # 获取潜在水印区域
         watermark_areas = self._detect_watermark_area()
 
-        # 随机选择一帧, 将所水印区域标记出来，用户看图判断是否是水印区域
+        # 随机抽取若干帧，第一帧用于将水印区域标记出来，用户看图判断是否是水印区域
         cap = cv2.VideoCapture(self.video_path)
-        ret, sample_frame = False, None
-        for i in range(10):
+        sample_frames = []
+        for i in range(config.WATERMARK_SAMPLE_FRAMES + 10):
             frame_no = random.randint(int(self.frame_count * 0.1), int(self.frame_count * 0.9))
             cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
-            ret, sample_frame = cap.read()
+            ret, frame = cap.read()
             if ret:
-                break
+                sample_frames.append(frame)
+                if len(sample_frames) >= config.WATERMARK_SAMPLE_FRAMES:
+                    break
         cap.release()
 
-        if not ret:
+        if len(sample_frames) == 0:
             print("Error in filter_watermark: reading frame from video")
             return
+        # 按区域画面在各帧之间的相似度从高到低排列，画面不变的区域更可能是水印
+        similarities = {area: self._watermark_similarity(sample_frames, area) for area in watermark_areas}
+        watermark_areas = sorted(watermark_areas, key=lambda area: similarities[area], reverse=True)
+        sample_frame = sample_frames[0]
 
         # 给潜在的水印区域编号
         area_num = ['E', 'D', 'C', 'B', 'A']
@@ -504,16 +809,11 @@ class SubtitleExtractor:
 
         area_num = ['E', 'D', 'C', 'B', 'A']
         for watermark_area in watermark_areas:
-            user_input = input(f"{area_num.pop()}{str(watermark_area)} "
+            user_input = input(f"{area_num.pop()}{str(watermark_area)} similarity: {similarities[watermark_area]:.3f} "
                                f"{config.interface_config['Main']['QuestionDelete']}").strip()
             if user_input == 'y' or user_input == '\n':
-                with open(self.raw_subtitle_path, mode='r+', encoding='utf-8') as f:
-                    content = f.readlines()
-                    f.seek(0)
-                    for i in content:
-                        if i.find(str(watermark_area[0])) == -1:
-                            f.write(i)
-                    f.truncate()
+                # 删除坐标与水印区域相同的记录
+                self.raw_store.select(~(self.raw_store.box == watermark_area[0]).all(axis=1))
                 print(config.interface_config['Main']['FinishDelete'])
         print(config.interface_config['Main']['FinishWaterMarkFilter'])
         # 删除缓存
@@ -553,15 +853,9 @@ class SubtitleExtractor:
 
         user_input = input(f"{(ymin, ymax)} {config.interface_config['Main']['DeleteNoSubArea']}").strip()
         if user_input == 'y' or user_input == '\n':
-            with open(self.raw_subtitle_path, mode='r+', encoding='utf-8') as f:
-                content = f.readlines()
-                f.seek(0)
-                for i in content:
-                    i_ymin = int(i.split('\t')[1].split('(')[1].split(')')[0].split(', ')[2])
-                    i_ymax = int(i.split('\t')[1].split('(')[1].split(')')[0].split(', ')[3])
-                    if ymin <= i_ymin and i_ymax <= ymax:
-                        f.write(i)
-                f.truncate()
+            # 只保留字幕区域内的记录
+            box = self.raw_store.box
+            self.raw_store.select((ymin <= box[:, 2]) & (box[:, 3] <= ymax))
             print(config.interface_config['Main']['FinishDeleteNoSubArea'])
         # 删除缓存
         if os.path.exists(sample_frame_file_path):
@@ -587,7 +881,7 @@ class SubtitleExtractor:
                     else:
                         frame_end = self._frame_to_timecode(int(content[1]))
                     frame_content = content[2]
-                    subtitle_line = f'{line_code}\n{frame_start} --> {frame_end}\n{frame_content}\n'
+                    subtitle_line = f'{line_code}\n{frame_start} --> {frame_end}\n{frame_content}\n\n'
                     f.write(subtitle_line)
             print(f"[NO-VSF]{config.interface_config['Main']['SubLocation']} {srt_filename}")
             # 返回持续时间低于1s的字幕行
@@ -628,62 +922,45 @@ class SubtitleExtractor:
 
     def _detect_watermark_area(self):
         """
-        根据识别出来的raw txt文件中的坐标点信息，查找水印区域
+        根据识别出来的原始字幕记录中的坐标点信息，查找水印区域
         假定：水印区域（台标）的坐标在水平和垂直方向都是固定的，也就是具有(xmin, xmax, ymin, ymax)相对固定
         根据坐标点信息，进行统计，将一直具有固定坐标的文本区域选出
         :return 返回最有可能的水印区域
         """
-        f = open(self.raw_subtitle_path, mode='r', encoding='utf-8')  # 打开txt文件，以‘utf-8’编码读取
-        line = f.readline()  # 以行的形式进行读取文件
-        # 坐标点列表
-        coordinates_list = []
-        # 帧列表
-        frame_no_list = []
-        # 内容列表
-        content_list = []
-        while line:
-            frame_no = line.split('\t')[0]
-            text_position = line.split('\t')[1].split('(')[1].split(')')[0].split(', ')
-            content = line.split('\t')[2]
-            frame_no_list.append(frame_no)
-            coordinates_list.append((int(text_position[0]),
-                                     int(text_position[1]),
-                                     int(text_position[2]),
-                                     int(text_position[3])))
-            content_list.append(content)
-            line = f.readline()
-        f.close()
         # 将坐标列表的相似值统一
-        coordinates_list = self._unite_coordinates(coordinates_list)
+        labels, centers, counts = self._unite_coordinates(self.raw_store.box)
 
-        # 将原txt文件的坐标更新为归一后的坐标
-        with open(self.raw_subtitle_path, mode='w', encoding='utf-8') as f:
-            for frame_no, coordinate, content in zip(frame_no_list, coordinates_list, content_list):
-                f.write(f'{frame_no}\t{coordinate}\t{content}')
+        # 将原始字幕记录的坐标更新为归一后的坐标
+        if len(labels) > 0:
+            self.raw_store.box = centers[labels]
 
-        if len(Counter(coordinates_list).most_common()) > config.WATERMARK_AREA_NUM:
-            # 读取配置文件，返回可能为水印区域的坐标列表
-            return Counter(coordinates_list).most_common(config.WATERMARK_AREA_NUM)
-        else:
-            # 不够则有几个返回几个
-            return Counter(coordinates_list).most_common()
+        # 读取配置文件，返回可能为水印区域的坐标列表，不够则有几个返回几个
+        return [(tuple(center), count) for center, count in
+                zip(centers[:config.WATERMARK_AREA_NUM].tolist(), counts[:config.WATERMARK_AREA_NUM].tolist())]
+
+    @staticmethod
+    def _watermark_similarity(frames, watermark_area):
+        """
+        计算候选水印区域在多帧之间的画面相似度
+        :param frames 随机抽取的视频帧
+        :param watermark_area _detect_watermark_area返回的 ((xmin, xmax, ymin, ymax), count)
+        :return 第一帧的区域与其余各帧区域的平均余弦相似度，只有一帧或区域为空时返回0
+        """
+        xmin, xmax, ymin, ymax = watermark_area[0]
+        ymin, ymax, xmin, xmax = max(min(ymin, ymax), 0), max(ymin, ymax), max(min(xmin, xmax), 0), max(xmin, xmax)
+        regions = [frame[ymin:ymax, xmin:xmax] for frame in frames]
+        if len(regions) < 2 or regions[0].size == 0:
+            return 0.
+        return float(compute_image_similarity_batch(regions[1:], regions[0]).mean())
 
     def _detect_subtitle_area(self):
         """
-        读取过滤水印区域后的raw txt文件，根据坐标信息，查找字幕区域
+        根据过滤水印区域后的原始字幕记录中的坐标信息，查找字幕区域
         假定：字幕区域在y轴上有一个相对固定的坐标范围，相对于场景文本，这个范围出现频率更高
         :return 返回字幕的区域位置
         """
-        # 打开去水印区域处理过的raw txt
-        f = open(self.raw_subtitle_path, mode='r', encoding='utf-8')  # 打开txt文件，以‘utf-8’编码读取
-        line = f.readline()  # 以行的形式进行读取文件
         # y坐标点列表
-        y_coordinates_list = []
-        while line:
-            text_position = line.split('\t')[1].split('(')[1].split(')')[0].split(', ')
-            y_coordinates_list.append((int(text_position[2]), int(text_position[3])))
-            line = f.readline()
-        f.close()
+        y_coordinates_list = [tuple(box) for box in self.raw_store.box[:, 2:4].tolist()]
         return Counter(y_coordinates_list).most_common(1)
 
     def _frame_to_timecode(self, frame_no):
@@ -692,36 +969,122 @@ class SubtitleExtractor:
         :param frame_no: 视频的帧号，i.e. 第几帧视频帧
         :returns: SMPTE格式时间戳 as string, 如'01:02:12:032' 或者 '01:02:12;032'
         """
-        # 设置当前帧号
-        cap = cv2.VideoCapture(self.video_path)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
-        ret, _ = cap.read()
-        # 获取当前帧号对应的时间戳
-        if ret:
-            milliseconds = cap.get(cv2.CAP_PROP_POS_MSEC)
-            if milliseconds <= 0:
-                return '{0:02d}:{1:02d}:{2:02d},{3:03d}'.format(int(frame_no / (3600 * self.fps)),
-                                                                int(frame_no / (60 * self.fps) % 60),
-                                                                int(frame_no / self.fps % 60),
-                                                                int(frame_no % self.fps))
-            seconds = milliseconds // 1000
-            milliseconds = int(milliseconds % 1000)
-            minutes = 0
-            hours = 0
-            if seconds >= 60:
-                minutes = int(seconds // 60)
-                seconds = int(seconds % 60)
-            if minutes >= 60:
-                hours = int(minutes // 60)
-                minutes = int(minutes % 60)
-            smpte_token = ','
-            cap.release()
-            return "%02d:%02d:%02d%s%03d" % (hours, minutes, seconds, smpte_token, milliseconds)
-        else:
+        # 从帧时间戳索引中获取帧号对应的时间戳，与seek到frame_no后读取一帧得到的时间戳一致
+        milliseconds = self.frame_pts.lookup(frame_no)
+        if milliseconds is None or milliseconds <= 0:
             return '{0:02d}:{1:02d}:{2:02d},{3:03d}'.format(int(frame_no / (3600 * self.fps)),
                                                             int(frame_no / (60 * self.fps) % 60),
                                                             int(frame_no / self.fps % 60),
                                                             int(frame_no % self.fps))
+        seconds = milliseconds // 1000
+        milliseconds = int(milliseconds % 1000)
+        minutes = 0
+        hours = 0
+        if seconds >= 60:
+            minutes = int(seconds // 60)
+            seconds = int(seconds % 60)
+        if minutes >= 60:
+            hours = int(minutes // 60)
+            minutes = int(minutes % 60)
+        smpte_token = ','
+        return "%02d:%02d:%02d%s%03d" % (hours, minutes, seconds, smpte_token, milliseconds)
+
+    def _record_frame_pts(self, current_frame_no):
+        """
+        记录刚刚读取的视频帧的时间戳
+        :param current_frame_no 刚刚读取的视频帧帧号，从1开始
+        """
+        self.frame_pts.record(current_frame_no - 1, self.video_cap.get(cv2.CAP_PROP_POS_MSEC))
+        # 定期保存时间戳索引，从检查点继续时不必重新解码之前的帧
+        if config.ENABLE_CHECKPOINT and current_frame_no % config.CHECKPOINT_INTERVAL == 0:
+            self.frame_pts.save(self.frame_pts_path)
+
+    def _checkpoint_key(self):
+        """
+        检查点对应的视频与识别参数，任何一项变化时检查点失效
+        """
+        stat = os.stat(self.video_path)
+        return {'video': os.path.abspath(self.video_path), 'size': stat.st_size, 'mtime': stat.st_mtime,
+                'sub_area': list(self.sub_area) if self.sub_area is not None else None,
+                'mode': config.MODE_TYPE, 'det_model': config.DET_MODEL_PATH, 'rec_model': config.REC_MODEL_PATH,
+                'adaptive': config.ADAPTIVE_SAMPLING, 'vsf': config.USE_VSF, 'frame_range': self.frame_range,
+                'onnx': config.USE_ONNX}
+
+    def _load_checkpoint(self):
+        """
+        读取OCR进程写入的检查点日志，将已提交的记录合并保存，并确定继续提取的帧号
+        """
+        self.resume_frame_no = 0
+        if not config.ENABLE_CHECKPOINT:
+            return
+        key = self._checkpoint_key()
+        checkpoint = None
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, mode='r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        journal_paths = glob.glob(f'{glob.escape(self.raw_subtitle_path)}*.journal')
+        if checkpoint is not None and checkpoint['key'] == key:
+            base_frame_no = checkpoint['resume_frame_no']
+            resume_store = RawSubtitleStore.load(self.resume_store_path) \
+                if base_frame_no > 0 and os.path.exists(self.resume_store_path) else RawSubtitleStore()
+            journals = [SegmentJournal.load(path) for path in journal_paths]
+            # 多个OCR进程时，每个进程都已经识别完成的帧才算已提交
+            resume_frame_no = min([base_frame_no if committed is None else committed for _, committed in journals],
+                                  default=base_frame_no)
+            # 时间戳索引也需要覆盖到继续提取的位置，分段提取时从该段的第一帧开始统计
+            self.frame_pts = FramePtsIndex.load(self.frame_pts_path)
+            start_frame_no = self.frame_range[0] - 1 if self.frame_range is not None else 0
+            resume_frame_no = min(resume_frame_no, self.frame_pts.recorded_count(start_frame_no))
+            # 该段还没有处理过任何一帧时从头开始
+            if resume_frame_no <= start_frame_no:
+                resume_frame_no = 0
+            if resume_frame_no < base_frame_no:
+                resume_store = RawSubtitleStore()
+                resume_frame_no = 0
+            for store, _ in journals:
+                frame_no = store.columns()[0]
+                store.select(frame_no <= resume_frame_no)
+                resume_store.extend(store)
+            self.resume_frame_no = resume_frame_no
+            resume_store.save(self.resume_store_path)
+            if self.resume_frame_no > 0:
+                print(f'Resume from frame {self.resume_frame_no}, {len(resume_store)} records restored')
+        elif os.path.exists(self.resume_store_path):
+            os.remove(self.resume_store_path)
+        if self.resume_frame_no == 0:
+            self.frame_pts = FramePtsIndex(self.frame_count)
+        for path in journal_paths:
+            os.remove(path)
+        with open(self.checkpoint_path, mode='w', encoding='utf-8') as f:
+            json.dump({'key': key, 'resume_frame_no': self.resume_frame_no}, f)
+
+    def _discard_checkpoint(self):
+        for path in [self.checkpoint_path, self.resume_store_path] + \
+                glob.glob(f'{glob.escape(self.raw_subtitle_path)}*.journal'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _seek_resume_frame(self):
+        """
+        从检查点继续或者分段提取时，将视频定位到需要处理的第一帧
+        :return 第一帧之前的帧号
+        """
+        start_frame_no = self.resume_frame_no
+        if self.frame_range is not None:
+            start_frame_no = max(start_frame_no, self.frame_range[0] - 1)
+        if start_frame_no > 0:
+            self.video_cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame_no)
+            self.update_progress(frame_extract=(start_frame_no / self.frame_count) * 100)
+        return start_frame_no
+
+    def _read_frame(self, current_frame_no):
+        """
+        读取下一帧，分段提取时超出frame_range的帧视为读取失败
+        :param current_frame_no 上一次读取的帧号
+        """
+        if self.frame_range is not None and self.frame_range[1] is not None and current_frame_no >= self.frame_range[1]:
+            return False, None
+        return self.video_cap.read()
 
     def _timestamp_to_frameno(self, time_ms):
         return int(time_ms / self.fps)
@@ -731,135 +1094,29 @@ class SubtitleExtractor:
 
     def _remove_duplicate_subtitle(self):
         """
-        读取原始的raw txt，去除重复行，返回去除了重复后的字幕列表
-        """
-        self._concat_content_with_same_frameno()
-        with open(self.raw_subtitle_path, mode='r', encoding='utf-8') as r:
-            lines = r.readlines()
-        RawInfo = namedtuple('RawInfo', 'no content')
-        content_list = []
-        for line in lines:
-            frame_no = line.split('\t')[0]
-            content = line.split('\t')[2]
-            content_list.append(RawInfo(frame_no, content))
+        根据原始字幕记录去除重复行，返回去除了重复后的字幕列表
+        """
+        # 同一帧的多行字幕合并与去重都在SubtitleDeduplicator中按帧号顺序一次完成
+        deduplicator = SubtitleDeduplicator(config.THRESHOLD_TEXT_SIMILARITY, extend_single_frame=not self.use_vsf)
+        self.raw_store.sort()
+        frame_no, _, text, _ = self.raw_store.columns()
         # 去重后的字幕列表
         unique_subtitle_list = []
-        idx_i = 0
-        content_list_len = len(content_list)
-        # 循环遍历每行字幕，记录开始时间与结束时间
-        while idx_i < content_list_len:
-            i = content_list[idx_i]
-            start_frame = i.no
-            idx_j = idx_i
-            while idx_j < content_list_len:
-                # 计算当前行与下一行的Levenshtein距离
-                # 判决idx_j的下一帧是否与idx_i不同，若不同（或者是最后一帧）则找到结束帧
-                if idx_j + 1 == content_list_len or ratio(i.content.replace(' ', ''), content_list[idx_j + 1].content.replace(' ', '')) < config.THRESHOLD_TEXT_SIMILARITY:
-                    # 若找到终点帧,定义字幕结束帧帧号
-                    end_frame = content_list[idx_j].no
-                    if not self.use_vsf:
-                        if end_frame == start_frame and idx_j + 1 < content_list_len:
-                            # 针对只有一帧的情况，以下一帧的开始时间为准(除非是最后一帧)
-                            end_frame = content_list[idx_j + 1][0]
-                    # 寻找最长字幕
-                    similar_list = content_list[idx_i:idx_j + 1]
-                    similar_content_strip_list = [item.content.replace(' ', '') for item in similar_list]
-                    index, _ = max(enumerate(similar_content_strip_list), key=lambda x: len(x[1]))
-
-                    # 添加进列表
-                    unique_subtitle_list.append((start_frame, end_frame, similar_list[index].content))
-                    idx_i = idx_j + 1
-                    break
-                else:
-                    idx_j += 1
-                    continue
+        for no, content in zip(frame_no.tolist(), text.tolist()):
+            unique_subtitle_list.extend(deduplicator.push(no, content))
+        unique_subtitle_list.extend(deduplicator.finish())
         return unique_subtitle_list
 
-    def _concat_content_with_same_frameno(self):
-        """
-        将raw txt文本中具有相同帧号的字幕行合并
-        """
-        with open(self.raw_subtitle_path, mode='r', encoding='utf-8') as r:
-            lines = r.readlines()
-        content_list = []
-        frame_no_list = []
-        for line in lines:
-            frame_no = line.split('\t')[0]
-            frame_no_list.append(frame_no)
-            coordinate = line.split('\t')[1]
-            content = line.split('\t')[2]
-            content_list.append([frame_no, coordinate, content])
-
-        # 找出那些不止一行的帧号
-        frame_no_list = [i[0] for i in Counter(frame_no_list).most_common() if i[1] > 1]
-
-        # 找出这些帧号出现的位置
-        concatenation_list = []
-        for frame_no in frame_no_list:
-            position = [i for i, x in enumerate(content_list) if x[0] == frame_no]
-            concatenation_list.append((frame_no, position))
-
-        for i in concatenation_list:
-            content = []
-            for j in i[1]:
-                content.append(content_list[j][2])
-            content = ' '.join(content).replace('\n', ' ') + '\n'
-            for k in i[1]:
-                content_list[k][2] = content
-
-        # 将多余的字幕行删除
-        to_delete = []
-        for i in concatenation_list:
-            for j in i[1][1:]:
-                to_delete.append(content_list[j])
-        for i in to_delete:
-            if i in content_list:
-                content_list.remove(i)
-
-        with open(self.raw_subtitle_path, mode='w', encoding='utf-8') as f:
-            for frame_no, coordinate, content in content_list:
-                content = unicodedata.normalize('NFKC', content)
-                f.write(f'{frame_no}\t{coordinate}\t{content}')
-
     def _unite_coordinates(self, coordinates_list):
         """
         给定一个坐标列表，将这个列表中相似的坐标统一为一个值
         e.g. 由于检测框检测的结果不是一致的，相同位置文字的坐标可能一次检测为(255,123,456,789)，另一次检测为(253,122,456,799)
         因此要对相似的坐标进行值的统一
         :param coordinates_list 包含坐标点的列表
-        :return: 返回一个统一值后的坐标列表
-        """
-        # 将相似的坐标统一为一个
-        index = 0
-        for coordinate in coordinates_list:  # TODO：时间复杂度n^2，待优化
-            for i in coordinates_list:
-                if self.__is_coordinate_similar(coordinate, i):
-                    coordinates_list[index] = i
-            index += 1
-        return coordinates_list
-
-    def _compute_image_similarity(self, image1, image2):
-        """
-        计算两张图片的余弦相似度
-        """
-        image1 = self.__get_thum(image1)
-        image2 = self.__get_thum(image2)
-        images = [image1, image2]
-        vectors = []
-        norms = []
-        for image in images:
-            vector = []
-            for pixel_tuple in image.getdata():
-                vector.append(average(pixel_tuple))
-            vectors.append(vector)
-            # linalg=linear（线性）+algebra（代数），norm则表示范数
-            # 求图片的范数
-            norms.append(linalg.norm(vector, 2))
-        a, b = vectors
-        a_norm, b_norm = norms
-        # dot返回的是点积，对二维数组（矩阵）进行计算
-        res = dot(a / a_norm, b / b_norm)
-        return res
+        :return: (labels每个坐标所属的类别, centers每个类别统一后的坐标, counts每个类别的坐标数量)，类别按数量从多到少排列
+        """
+        # 按像素点容忍度划分网格进行聚类
+        return cluster_coordinates(coordinates_list, config.PIXEL_TOLERANCE_X, config.PIXEL_TOLERANCE_Y)
 
     def __get_area_text(self, ocr_result):
         """
@@ -882,23 +1139,38 @@ class SubtitleExtractor:
                     area_text.append(content[0])
         return area_text
 
-    def _compare_ocr_result(self, result_cache, img1, img1_no, img2, img2_no):
+    def _predict_region(self, img, dt_boxes=None, origin=(0, 0)):
         """
-        比较两张图片预测出的字幕区域文本是否相同
+        识别裁剪后的区域，并将检测框换算回原视频帧坐标
+        :param img 裁剪后的区域
+        :param dt_boxes 字幕检测阶段在img上得到的检测框，为None时重新检测
+        :param origin img左上角在原视频帧中的坐标(y, x)
         """
         if self.ocr is None:
-            self.ocr = OcrRecogniser()
+            self.ocr = get_ocr_recogniser(cpu_threads=self.cpu_threads, owner='extractor')
+        if dt_boxes is None:
+            dt_box, rec_res = self.ocr.predict(img)
+        else:
+            dt_box, rec_res = self.ocr.predict_with_boxes(img, dt_boxes)
+        return subtitle_ocr.translate_boxes(dt_box, origin), rec_res
+
+    def _compare_ocr_result(self, result_cache, img1, img1_no, img2, img2_no, img2_boxes=None, origin=(0, 0)):
+        """
+        比较两张图片预测出的字幕区域文本是否相同
+        :param img2_boxes 字幕检测阶段在img2上得到的检测框
+        :param origin 两张图片左上角在原视频帧中的坐标(y, x)
+        """
         if img1_no in result_cache:
             area_text1 = result_cache[img1_no]['text']
         else:
-            dt_box, rec_res = self.ocr.predict(img1)
+            dt_box, rec_res = self._predict_region(img1, origin=origin)
             area_text1 = "".join(self.__get_area_text((dt_box, rec_res)))
             result_cache[img1_no] = {'text': area_text1, 'dt_box': dt_box, 'rec_res': rec_res}
 
         if img2_no in result_cache:
             area_text2 = result_cache[img2_no]['text']
         else:
-            dt_box, rec_res = self.ocr.predict(img2)
+            dt_box, rec_res = self._predict_region(img2, img2_boxes, origin)
             area_text2 = "".join(self.__get_area_text((dt_box, rec_res)))
             result_cache[img2_no] = {'text': area_text2, 'dt_box': dt_box, 'rec_res': rec_res}
         delete_no_list = []
@@ -912,29 +1184,6 @@ class SubtitleExtractor:
         else:
             return False
 
-    @staticmethod
-    def __is_coordinate_similar(coordinate1, coordinate2):
-        """
-        计算两个坐标是否相似，如果两个坐标点的xmin,xmax,ymin,ymax的差值都在像素点容忍度内
-        则认为这两个坐标点相似
-        """
-        return abs(coordinate1[0] - coordinate2[0]) < config.PIXEL_TOLERANCE_X and \
-            abs(coordinate1[1] - coordinate2[1]) < config.PIXEL_TOLERANCE_X and \
-            abs(coordinate1[2] - coordinate2[2]) < config.PIXEL_TOLERANCE_Y and \
-            abs(coordinate1[3] - coordinate2[3]) < config.PIXEL_TOLERANCE_Y
-
-    @staticmethod
-    def __get_thum(image, size=(64, 64), greyscale=False):
-        """
-        对图片进行统一化处理
-        """
-        # 利用image对图像大小重新设置, Image.ANTIALIAS为高质量的
-        image = image.resize(size, Image.ANTIALIAS)
-        if greyscale:
-            # 将图片转换为L模式，其为灰度图，其每个像素用8个bit表示
-            image = image.convert('L')
-        return image
-
     def __delete_frame_cache(self):
         if not config.DEBUG_NO_DELETE_CACHE:
             if len(os.listdir(self.frame_output_dir)) > 0:
@@ -961,6 +1210,35 @@ class SubtitleExtractor:
             self.progress_frame_extract = frame_extract
         self.progress_total = (self.progress_frame_extract + self.progress_ocr) / 2
 
+    def _share_frame(self, frame):
+        """
+        将视频帧裁剪至需要识别的区域后写入共享内存帧环
+        :return 帧引用，未启用共享内存或OCR进程已退出时返回None，由OCR进程根据帧号自行解码
+        """
+        if self.frame_ring is None:
+            return None
+        roi_sub_area = self.sub_area if config.SUB_AREA_ROI else None
+        frame, origin = subtitle_ocr.crop_ocr_region(frame, roi_sub_area, self.default_subtitle_area,
+                                                     config.SUB_AREA_ROI_MARGIN)
+        return self._share_region(frame, origin)
+
+    def _share_region(self, region, origin):
+        """
+        将已裁剪好的识别区域写入共享内存帧环
+        :param region 需要识别的区域
+        :param origin 区域左上角在原视频帧中的坐标(y, x)
+        :return 帧引用，未启用共享内存或OCR进程已退出时返回None
+        """
+        if self.frame_ring is None:
+            return None
+        while True:
+            frame_ref = self.frame_ring.put(region, origin, timeout=1)
+            if frame_ref is not None:
+                return frame_ref
+            # 槽位一直被占用且OCR进程已经退出，不再等待
+            if not self.subtitle_ocr_process.is_alive():
+                return None
+
     def start_subtitle_ocr_async(self):
         def get_ocr_progress():
             """
@@ -981,6 +1259,18 @@ class SubtitleExtractor:
                 if current_frame_no == -1:
                     return
 
+        # 根据CPU核数计算OCR进程数量以及每个进程的推理线程数
+        worker_num, cpu_threads = subtitle_ocr.ocr_worker_config(config.USE_GPU,
+                                                                 self.cpu_threads or config.CPU_THREADS,
+                                                                 1 if self.ocr_in_process else config.OCR_WORKER_NUM)
+        # 与OCR进程使用相同的线程数；在当前进程中识别时OCR线程与主线程会并发推理，主线程使用owner='extractor'单独持有一份模型
+        self.cpu_threads = cpu_threads
+        if worker_num > 1:
+            print(f'OCR workers: {worker_num}, cpu threads per worker: {cpu_threads}')
+        if config.SHARED_FRAME_SLOTS > 0:
+            # 每个OCR进程都会攒一批帧，槽位数量至少要能覆盖所有进程的batch
+            slot_count = max(config.SHARED_FRAME_SLOTS, worker_num * config.OCR_BATCH_SIZE * 2)
+            self.frame_ring = SharedFrameRing(slot_count, self.frame_height * self.frame_width * 3)
         process, task_queue, progress_queue = subtitle_ocr.async_start(self.video_path,
                                                                        self.raw_subtitle_path,
                                                                        self.sub_area,
@@ -988,10 +1278,22 @@ class SubtitleExtractor:
                                                                                 'DROP_SCORE': config.DROP_SCORE,
                                                                                 'SUB_AREA_DEVIATION_RATE': config.SUB_AREA_DEVIATION_RATE,
                                                                                 'DEBUG_OCR_LOSS': config.DEBUG_OCR_LOSS,
-                                                                                }
+                                                                                'SUB_AREA_ROI': config.SUB_AREA_ROI,
+                                                                                'SUB_AREA_ROI_MARGIN': config.SUB_AREA_ROI_MARGIN,
+                                                                                'OCR_BATCH_SIZE': config.OCR_BATCH_SIZE,
+                                                                                'OCR_BATCH_TIMEOUT': config.OCR_BATCH_TIMEOUT,
+                                                                                'CPU_THREADS': cpu_threads,
+                                                                                'OCR_WORKER_BLOCK_SIZE': config.OCR_WORKER_BLOCK_SIZE,
+                                                                                'CHECKPOINT_INTERVAL': config.CHECKPOINT_INTERVAL if config.ENABLE_CHECKPOINT else 0,
+                                                                                'RESUME_FRAME_NO': self.resume_frame_no,
+                                                                                },
+                                                                       frame_ring=self.frame_ring,
+                                                                       worker_num=worker_num,
+                                                                       in_process=self.ocr_in_process
                                                                        )
         self.subtitle_ocr_task_queue = task_queue
         self.subtitle_ocr_progress_queue = progress_queue
+        self.subtitle_ocr_process = process
         # 开启线程负责更新OCR进度
         Thread(target=get_ocr_progress, daemon=True).start()
         return process
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+分段并行提取字幕
+将一个视频按时间切分为多段，每一段在单独的工作进程中独立解码、查找字幕帧并OCR识别，
+最后按帧号合并各段的原始字幕记录与帧时间戳，统一去重生成字幕文件。
+每一段从其负责范围之前SEGMENT_OVERLAP秒开始处理，用于预热解码与字幕变化检测，
+重叠部分的记录以前一段为准，跨越分段边界的字幕在合并后仍然是连续的一条
+
+用法：
+    python parallel.py <视频路径> [--sub-area ymin ymax xmin xmax] [--jobs N] [--overlap 秒]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+import config
+from batch import batch_worker_config
+from tools.frame_index import FramePtsIndex
+from tools.raw_store import RawSubtitleStore
+
+# 分段任务: video_path视频路径, sub_area字幕区域, start开始处理的帧号, end结束帧号(包含，为None时到视频结束),
+# owned_start该段负责的第一帧，owned_start之前的帧属于前一段
+SegmentJob = namedtuple('SegmentJob', 'video_path sub_area start end owned_start')
+
+# 工作进程中每个OCR使用的CPU线程数，由_init_worker设置
+_cpu_threads = None
+
+
+def split_segments(frame_count, k, overlap_frames):
+    """
+    将视频帧均匀切分为k段
+    :param frame_count 视频总帧数
+    :param k 段数
+    :param overlap_frames 每一段向前多处理的帧数
+    :return [(start开始处理的帧号, end结束帧号, owned_start负责的第一帧)]，帧号从1开始，最后一段的end为None
+    """
+    frame_count = int(frame_count)
+    # 每一段至少要比重叠部分长，否则分段没有意义
+    k = max(min(int(k), frame_count // max(overlap_frames * 2, 1)), 1)
+    bounds = [round(frame_count * i / k) for i in range(k + 1)]
+    segments = []
+    for i in range(k):
+        owned_start = bounds[i] + 1
+        end = bounds[i + 1] if i < k - 1 else None
+        segments.append((max(owned_start - overlap_frames, 1), end, owned_start))
+    return segments
+
+
+def _init_worker(cpu_threads):
+    global _cpu_threads
+    _cpu_threads = cpu_threads
+
+
+def _run_segment(job):
+    """
+    在工作进程中提取一段视频的原始字幕记录，OCR在当前进程中进行
+    :return (raw_path原始字幕记录路径, frame_pts_path帧时间戳路径, temp_output_dir该段的临时文件夹)
+    """
+    from main import SubtitleExtractor
+    se = SubtitleExtractor(job.video_path, job.sub_area, interactive=False, ocr_in_process=True,
+                           cpu_threads=_cpu_threads, frame_range=(job.start, job.end))
+    se.extract_raw_subtitles()
+    raw_path = os.path.join(se.subtitle_output_dir, 'segment.bin')
+    se.raw_store.save(raw_path)
+    return raw_path, se.frame_pts_path, se.temp_output_dir
+
+
+def merge_segments(jobs, results, frame_count):
+    """
+    合并各段的原始字幕记录与帧时间戳，每一段只保留其负责范围内的记录
+    :param jobs [SegmentJob]，按时间顺序
+    :param results 与jobs对应的_run_segment返回值
+    :return (raw_store, frame_pts)
+    """
+    raw_store = RawSubtitleStore()
+    frame_pts = FramePtsIndex(frame_count)
+    for index, (job, (raw_path, frame_pts_path, _)) in enumerate(zip(jobs, results)):
+        store = RawSubtitleStore.load(raw_path)
+        frame_no = store.columns()[0]
+        owned = frame_no >= job.owned_start
+        if index + 1 < len(jobs):
+            owned &= frame_no < jobs[index + 1].owned_start
+        store.select(owned)
+        raw_store.extend(store)
+        # 时间戳取并集，同一帧以前一段记录的为准
+        pts = FramePtsIndex.load(frame_pts_path).pts
+        if len(pts) > len(frame_pts.pts):
+            frame_pts.record(len(pts) - 1, np.nan)
+        missing = np.isnan(frame_pts.pts[:len(pts)])
+        frame_pts.pts[:len(pts)][missing] = pts[missing]
+    raw_store.sort()
+    return raw_store, frame_pts
+
+
+def run_segments(video_path, sub_area=None, jobs=0, overlap=None):
+    """
+    分段并行提取一个视频的字幕
+    :param video_path 视频路径
+    :param sub_area 字幕区域 (ymin, ymax, xmin, xmax)
+    :param jobs 段数(进程数)，小于等于0时根据CPU核数自动计算
+    :param overlap 每一段向前多处理的时长(秒)，为None时使用配置文件中的值
+    """
+    start_time = time.time()
+    video_cap = cv2.VideoCapture(video_path)
+    frame_count = video_cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    fps = video_cap.get(cv2.CAP_PROP_FPS)
+    video_cap.release()
+    overlap = config.SEGMENT_OVERLAP if overlap is None else overlap
+    jobs, cpu_threads = batch_worker_config(jobs or config.SEGMENT_JOBS)
+    segment_jobs = [SegmentJob(video_path, sub_area, start, end, owned_start)
+                    for start, end, owned_start in split_segments(frame_count, jobs, max(int(fps * overlap), 0))]
+    print(f'Parallel: {len(segment_jobs)} segments, cpu threads per segment: {cpu_threads}')
+    with ProcessPoolExecutor(max_workers=len(segment_jobs), mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(cpu_threads,)) as executor:
+        results = list(executor.map(_run_segment, segment_jobs))
+    raw_store, frame_pts = merge_segments(segment_jobs, results, frame_count)
+    from main import SubtitleExtractor
+    se = SubtitleExtractor(video_path, sub_area, interactive=False)
+    se.raw_store = raw_store
+    se.frame_pts = frame_pts
+    se.generate_subtitles(start_time)
+    if not config.DEBUG_NO_DELETE_CACHE:
+        for _, _, temp_output_dir in results:
+            shutil.rmtree(temp_output_dir, True)
+    if config.GENERATE_TXT:
+        se.srt2txt(os.path.join(os.path.splitext(video_path)[0] + '.srt'))
+    return se
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='segment-parallel subtitle extraction')
+    parser.add_argument('video', help='video path')
+    parser.add_argument('--sub-area', type=int, nargs=4, default=None, metavar=('YMIN', 'YMAX', 'XMIN', 'XMAX'),
+                        help='subtitle area')
+    parser.add_argument('--jobs', type=int, default=0, help='number of segments processed concurrently')
+    parser.add_argument('--overlap', type=float, default=None, help='seconds each segment starts before its range')
+    args = parser.parse_args(argv)
+    run_segments(args.video, tuple(args.sub_area) if args.sub_area else None, args.jobs, args.overlap)
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method("spawn")
+    sys.exit(main())
@@ -38,6 +38,7 @@ class DBPostProcess(object):
                  unclip_ratio=2.0,
                  use_dilation=False,
                  score_mode="fast",
+                 axis_aligned=False,
                  **kwargs):
         self.thresh = thresh
         self.box_thresh = box_thresh
@@ -48,6 +49,9 @@ class DBPostProcess(object):
         assert score_mode in [
             "slow", "fast"
         ], "Score mode must be in [slow, fast] but got: {}".format(score_mode)
+        # only output axis-aligned boxes, computed from connected components
+        # instead of contours, for horizontal text such as subtitles
+        self.axis_aligned = axis_aligned
 
         self.dilation_kernel = None if not use_dilation else np.array(
             [[1, 1], [1, 1]])
@@ -58,6 +62,10 @@ class DBPostProcess(object):
                 whose values are binarized as {0, 1}
         '''
 
+        if self.axis_aligned:
+            return self.boxes_from_bitmap_axis_aligned(pred, _bitmap,
+                                                       dest_width, dest_height)
+
         bitmap = _bitmap
         height, width = bitmap.shape
 
@@ -99,6 +107,71 @@ class DBPostProcess(object):
             scores.append(score)
         return np.array(boxes, dtype=np.int16), scores
 
+    def boxes_from_bitmap_axis_aligned(self, pred, _bitmap, dest_width,
+                                       dest_height):
+        '''
+        Contour-free version of boxes_from_bitmap for horizontal text.
+        Each connected component is taken as a text region and its bounding
+        rectangle as the mini box, scores are read from an integral image
+        (fast) or accumulated per label (slow), and the rectangle is
+        expanded by the unclip distance analytically.
+        '''
+        bitmap = _bitmap.astype(np.uint8)
+        height, width = bitmap.shape
+        num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+            bitmap, connectivity=8)
+        stats = stats[1:min(num_labels, self.max_candidates + 1)]
+        if len(stats) == 0:
+            return np.zeros((0, 4, 2), dtype=np.int16), []
+        # pixel coordinates of the rectangle corners, same as the points of
+        # the contour that minAreaRect is fitted to
+        xmin = stats[:, cv2.CC_STAT_LEFT].astype(np.float64)
+        ymin = stats[:, cv2.CC_STAT_TOP].astype(np.float64)
+        xmax = xmin + stats[:, cv2.CC_STAT_WIDTH] - 1
+        ymax = ymin + stats[:, cv2.CC_STAT_HEIGHT] - 1
+        box_w, box_h = xmax - xmin, ymax - ymin
+
+        if self.score_mode == "fast":
+            integral = cv2.integral(pred.astype(np.float32), sdepth=cv2.CV_64F)
+            x0, y0 = xmin.astype(np.int64), ymin.astype(np.int64)
+            x1, y1 = xmax.astype(np.int64) + 1, ymax.astype(np.int64) + 1
+            total = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + \
+                integral[y0, x0]
+            scores = total / ((box_w + 1) * (box_h + 1))
+        else:
+            total = np.bincount(
+                labels.ravel(),
+                weights=pred.ravel().astype(np.float64),
+                minlength=num_labels)
+            scores = total[1:len(stats) + 1] / stats[:, cv2.CC_STAT_AREA]
+
+        # offsetting a w x h rectangle by d gives a (w + 2d) x (h + 2d)
+        # bounding rectangle, d = area * unclip_ratio / perimeter
+        perimeter = np.maximum(2 * (box_w + box_h), 1e-6)
+        distance = box_w * box_h * self.unclip_ratio / perimeter
+        keep = (np.minimum(box_w, box_h) >= self.min_size) & \
+            (scores >= self.box_thresh) & \
+            (np.minimum(box_w, box_h) + 2 * distance >= self.min_size + 2)
+        xmin, xmax = xmin[keep] - distance[keep], xmax[keep] + distance[keep]
+        ymin, ymax = ymin[keep] - distance[keep], ymax[keep] + distance[keep]
+
+        xmin, xmax = [
+            np.clip(np.round(x / width * dest_width), 0, dest_width)
+            for x in (xmin, xmax)
+        ]
+        ymin, ymax = [
+            np.clip(np.round(y / height * dest_height), 0, dest_height)
+            for y in (ymin, ymax)
+        ]
+        # same point order as get_mini_boxes: tl, tr, br, bl
+        boxes = np.stack(
+            [
+                np.stack([xmin, ymin], axis=1), np.stack([xmax, ymin], axis=1),
+                np.stack([xmax, ymax], axis=1), np.stack([xmin, ymax], axis=1)
+            ],
+            axis=1)
+        return boxes.astype(np.int16), scores[keep].tolist()
+
     def unclip(self, box):
         unclip_ratio = self.unclip_ratio
         poly = Polygon(box)
@@ -202,6 +275,7 @@ class DistillationDBPostProcess(object):
                  unclip_ratio=1.5,
                  use_dilation=False,
                  score_mode="fast",
+                 axis_aligned=False,
                  **kwargs):
         self.model_name = model_name
         self.key = key
@@ -211,7 +285,8 @@ class DistillationDBPostProcess(object):
             max_candidates=max_candidates,
             unclip_ratio=unclip_ratio,
             use_dilation=use_dilation,
-            score_mode=score_mode)
+            score_mode=score_mode,
+            axis_aligned=axis_aligned)
 
     def __call__(self, predicts, shape_list):
         results = {}
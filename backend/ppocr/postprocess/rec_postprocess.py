@@ -50,6 +50,10 @@ class BaseRecLabelDecode(object):
 
     def decode(self, text_index, text_prob=None, is_remove_duplicate=False):
         """ convert text-index into text-label. """
+        if isinstance(text_index, np.ndarray) and text_index.ndim == 2 and (
+                text_prob is None or isinstance(text_prob, np.ndarray)):
+            return self.decode_batch(text_index, text_prob,
+                                     is_remove_duplicate)
         result_list = []
         ignored_tokens = self.get_ignored_tokens()
         batch_size = len(text_index)
@@ -76,6 +80,58 @@ class BaseRecLabelDecode(object):
             result_list.append((text, np.mean(conf_list).tolist()))
         return result_list
 
+    def decode_batch(self, text_index, text_prob=None,
+                     is_remove_duplicate=False):
+        """ vectorised decode of a (batch, T) index array, same output as
+        the per-row loop: duplicate and ignored-token masks are built for
+        the whole batch, characters are looked up in a NumPy table and
+        joined once, and confidences are averaged per row with bincount.
+        """
+        batch_size, seq_len = text_index.shape
+        if batch_size == 0:
+            return []
+        selection = np.ones(text_index.shape, dtype=bool)
+        if is_remove_duplicate:
+            selection[:, 1:] = text_index[:, 1:] != text_index[:, :-1]
+        for ignored_token in self.get_ignored_tokens():
+            selection &= text_index != ignored_token
+
+        character_table, character_len = self._character_table()
+        selected = text_index[selection]
+        rows = np.nonzero(selection)[0]
+        counts = np.bincount(rows, minlength=batch_size)
+        # all rows are joined into one string and sliced by character
+        # offsets, since a dictionary entry may be longer than one char
+        joined = ''.join(character_table[selected].tolist())
+        offsets = np.zeros(batch_size + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(
+            np.bincount(
+                rows, weights=character_len[selected],
+                minlength=batch_size)).astype(np.int64)
+        if text_prob is not None:
+            sums = np.bincount(
+                rows,
+                weights=text_prob[selection].astype(np.float64),
+                minlength=batch_size)
+            scores = (sums / np.maximum(counts, 1)).astype(np.float32)
+        else:
+            # the per-row loop averages a list of ones over the whole row
+            scores = np.full(batch_size, 1 if seq_len > 0 else 0,
+                             dtype=np.float32)
+        offsets = offsets.tolist()
+        return [(joined[offsets[i]:offsets[i + 1]], score)
+                for i, score in enumerate(scores.tolist())]
+
+    def _character_table(self):
+        if getattr(self, '_character_cache', None) is None or len(
+                self._character_cache[0]) != len(self.character):
+            character_table = np.empty(len(self.character), dtype=object)
+            character_table[:] = self.character
+            character_len = np.array(
+                [len(char) for char in self.character], dtype=np.float64)
+            self._character_cache = (character_table, character_len)
+        return self._character_cache
+
     def get_ignored_tokens(self):
         return [0]  # for ctc blank
 
@@ -94,7 +150,9 @@ class CTCLabelDecode(BaseRecLabelDecode):
         if isinstance(preds, paddle.Tensor):
             preds = preds.numpy()
         preds_idx = preds.argmax(axis=2)
-        preds_prob = preds.max(axis=2)
+        # read the max from the argmax instead of a second pass over C
+        preds_prob = np.take_along_axis(
+            preds, preds_idx[:, :, np.newaxis], axis=2)[:, :, 0]
         text = self.decode(preds_idx, preds_prob, is_remove_duplicate=True)
         if label is None:
             return text
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+INT8量化
+从自己的视频中截取字幕区域与文本行作为校准集，对V4的检测与识别模型做离线量化(PaddleSlim post-training quantization)，
+量化后的模型保存在原模型目录旁(目录名加_int8后缀)，settings.ini中设置 Mode = fast_int8 时使用；
+并在测试集上对比量化前后的检测框、识别结果与速度，输出报告
+
+用法：
+    python quantize.py collect <视频目录或清单文件> <输出目录> [--interval 秒] [--max-samples N]
+    python quantize.py quantize <校准集目录> [--det-model 目录] [--rec-model 目录] [--batch-nums N] [--algo hist]
+    python quantize.py compare <测试集目录> [--det-model 目录] [--rec-model 目录] [--report report.json]
+量化需要安装paddleslim；测试集建议使用与校准集不同的视频截取，清单文件格式与batch.py相同
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+import config
+from batch import collect_jobs
+from tools import subtitle_ocr
+from tools.det_preprocess import DetPreprocessor
+from tools.infer import utility
+from tools.infer.predict_det import TextDetector
+from tools.infer.predict_rec import TextRecognizer
+from tools.infer.predict_system import sorted_boxes
+from tools.infer.utility import get_rotate_crop_image
+
+# 默认量化的模型: V4的轻量检测与识别模型
+DEFAULT_DET_MODEL = os.path.join(config.DET_MODEL_BASE, 'V4', 'ch_det_fast')
+DEFAULT_REC_MODEL = os.path.join(config.REC_MODEL_BASE, 'V4', f'{config.REC_CHAR_TYPE}_rec_fast')
+
+
+def int8_model_dir(model_dir):
+    """
+    量化模型的保存目录，与原模型目录相邻
+    """
+    return os.path.normpath(model_dir) + '_int8'
+
+
+def _predictor_args(det_model_dir=None, rec_model_dir=None, precision='fp32'):
+    """
+    与fast_int8模式下OcrRecogniser相同的CPU推理参数，INT8模型需要通过MKLDNN推理
+    """
+    args = utility.init_args().parse_args([])
+    args.use_gpu = False
+    args.use_onnx = False
+    args.cpu_threads = config.CPU_THREADS
+    args.enable_mkldnn = True
+    args.precision = precision
+    args.det_model_dir = det_model_dir
+    args.rec_model_dir = rec_model_dir
+    args.rec_char_dict_path = config.DICT_PATH
+    args.rec_image_shape = config.REC_IMAGE_SHAPE
+    args.rec_batch_num = config.REC_BATCH_NUM
+    return args
+
+
+def _read_images(directory):
+    images = [cv2.imread(path) for path in sorted(glob.glob(os.path.join(directory, '*.png')))]
+    return [img for img in images if img is not None]
+
+
+def collect(source, output_dir, det_model=DEFAULT_DET_MODEL, interval=1.0, max_samples=500):
+    """
+    从视频中截取校准集：每隔interval秒取一帧的字幕区域，检测到文本时保存字幕区域(det)以及每个文本行(rec)
+    :param source 视频目录、清单文件或单个视频路径
+    :param output_dir 输出目录，其中det与rec子目录分别保存检测与识别模型的校准图像
+    :return 保存的字幕区域数量
+    """
+    det_dir, rec_dir = os.path.join(output_dir, 'det'), os.path.join(output_dir, 'rec')
+    os.makedirs(det_dir, exist_ok=True)
+    os.makedirs(rec_dir, exist_ok=True)
+    detector = TextDetector(_predictor_args(det_model_dir=det_model))
+    count = 0
+    for job in collect_jobs(source):
+        video_cap = cv2.VideoCapture(job.video_path)
+        step = max(int((video_cap.get(cv2.CAP_PROP_FPS) or 25) * interval), 1)
+        name = Path(job.video_path).stem
+        frame_no = 0
+        # 只解码需要截取的帧
+        while count < max_samples and video_cap.grab():
+            frame_no += 1
+            if frame_no % step != 0:
+                continue
+            ret, frame = video_cap.retrieve()
+            if not ret:
+                break
+            region, _ = subtitle_ocr.crop_ocr_region(frame, job.sub_area, config.DEFAULT_SUBTITLE_AREA,
+                                                     config.SUB_AREA_ROI_MARGIN)
+            dt_boxes, _ = detector(region)
+            if dt_boxes is None or len(dt_boxes) == 0:
+                continue
+            cv2.imwrite(os.path.join(det_dir, f'{name}_{frame_no}.png'), region)
+            for index, box in enumerate(sorted_boxes(dt_boxes)):
+                crop = get_rotate_crop_image(region, np.array(box, dtype=np.float32))
+                cv2.imwrite(os.path.join(rec_dir, f'{name}_{frame_no}_{index}.png'), crop)
+            count += 1
+        video_cap.release()
+        print(f'{job.video_path}: {count} samples')
+    return count
+
+
+def _det_input(img, preprocessor):
+    batch, _ = preprocessor(img)
+    # 预处理结果写在复用的缓冲区中，需要复制
+    return batch[0].copy()
+
+
+def _rec_input(img, rec_image_shape):
+    """
+    与TextRecognizer.resize_norm_img一致：保持宽高比缩放到固定高度，右侧补0到固定宽度
+    """
+    img_c, img_h, img_w = rec_image_shape
+    h, w = img.shape[:2]
+    resized_w = min(int(math.ceil(img_h * w / float(h))), img_w)
+    resized = cv2.resize(img, (resized_w, img_h)).astype('float32')
+    resized = resized.transpose((2, 0, 1)) / 255
+    resized -= 0.5
+    resized /= 0.5
+    padding = np.zeros((img_c, img_h, img_w), dtype=np.float32)
+    padding[:, :, :resized_w] = resized
+    return padding
+
+
+def quantize(model_dir, kind, calib_dir, output_dir=None, batch_nums=None, algo='hist'):
+    """
+    使用校准集对一个推理模型做离线量化
+    :param model_dir Paddle推理模型目录(inference.pdmodel, inference.pdiparams)
+    :param kind 'det'或'rec'，决定校准图像的子目录与预处理方式
+    :param calib_dir 校准集目录
+    :param output_dir 量化模型的保存目录，为None时保存在原模型目录旁
+    :param batch_nums 使用多少个batch校准，为None时使用全部校准图像
+    :param algo 激活值量化参数的计算方法: hist, KL, avg, abs_max, mse
+    :return 量化模型的保存目录
+    """
+    try:
+        from paddleslim.quant import quant_post_static
+    except ImportError:
+        raise ImportError('post-training quantization requires paddleslim, install it with: pip install paddleslim')
+    import paddle
+    output_dir = output_dir or int8_model_dir(model_dir)
+    images = _read_images(os.path.join(calib_dir, kind))
+    if len(images) == 0:
+        raise ValueError(f'no calibration images in {os.path.join(calib_dir, kind)}')
+    args = _predictor_args()
+    if kind == 'det':
+        preprocessor = DetPreprocessor(args.det_limit_side_len, args.det_limit_type)
+        # 字幕区域缩放后的尺寸不同，每个batch只有一张图像
+        batch_size = 1
+
+        def sample_generator():
+            for img in images:
+                yield [_det_input(img, preprocessor)]
+    else:
+        rec_image_shape = [int(v) for v in args.rec_image_shape.split(',')]
+        batch_size = config.REC_BATCH_NUM
+
+        def sample_generator():
+            for img in images:
+                yield [_rec_input(img, rec_image_shape)]
+    paddle.enable_static()
+    try:
+        quant_post_static(executor=paddle.static.Executor(paddle.CPUPlace()), model_dir=model_dir,
+                          quantize_model_path=output_dir, sample_generator=sample_generator,
+                          model_filename='inference.pdmodel', params_filename='inference.pdiparams',
+                          save_model_filename='inference.pdmodel', save_params_filename='inference.pdiparams',
+                          batch_size=batch_size, batch_nums=batch_nums, algo=algo,
+                          quantizable_op_type=['conv2d', 'depthwise_conv2d', 'mul', 'matmul'])
+    finally:
+        paddle.disable_static()
+    print(f'{model_dir} -> {output_dir}, calibrated with {len(images)} images')
+    return output_dir
+
+
+def _box_iou(boxes1, boxes2):
+    """
+    两组检测框外接矩形之间的IoU矩阵
+    """
+    if len(boxes1) == 0 or len(boxes2) == 0:
+        return np.zeros((len(boxes1), len(boxes2)))
+    rects = []
+    for boxes in (boxes1, boxes2):
+        boxes = np.asarray(boxes, dtype=np.float64)
+        rects.append(np.concatenate([boxes.min(axis=1), boxes.max(axis=1)], axis=1))
+    a, b = rects[0][:, np.newaxis], rects[1][np.newaxis]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def compare_det(images, fp32_model, int8_model, iou_threshold=0.5):
+    results, elapsed = {}, {}
+    for precision, model_dir in (('fp32', fp32_model), ('int8', int8_model)):
+        detector = TextDetector(_predictor_args(det_model_dir=model_dir, precision=precision))
+        # 预热
+        detector(images[0])
+        start = time.time()
+        results[precision] = [detector(img)[0] for img in images]
+        elapsed[precision] = (time.time() - start) / len(images)
+    matched_fp32, matched_int8, total_fp32, total_int8 = 0, 0, 0, 0
+    for boxes_fp32, boxes_int8 in zip(results['fp32'], results['int8']):
+        boxes_fp32 = boxes_fp32 if boxes_fp32 is not None else []
+        boxes_int8 = boxes_int8 if boxes_int8 is not None else []
+        iou = _box_iou(boxes_fp32, boxes_int8)
+        total_fp32 += len(boxes_fp32)
+        total_int8 += len(boxes_int8)
+        if iou.size > 0:
+            matched_fp32 += int((iou.max(axis=1) >= iou_threshold).sum())
+            matched_int8 += int((iou.max(axis=0) >= iou_threshold).sum())
+    return {'images': len(images), 'fp32_model': fp32_model, 'int8_model': int8_model,
+            'fp32_ms': round(elapsed['fp32'] * 1000, 2), 'int8_ms': round(elapsed['int8'] * 1000, 2),
+            'speedup': round(elapsed['fp32'] / max(elapsed['int8'], 1e-9), 2),
+            'boxes_fp32': total_fp32, 'boxes_int8': total_int8,
+            'box_recall': round(matched_fp32 / max(total_fp32, 1), 4),
+            'box_precision': round(matched_int8 / max(total_int8, 1), 4)}
+
+
+def compare_rec(images, fp32_model, int8_model):
+    from Levenshtein import ratio
+    results, elapsed = {}, {}
+    for precision, model_dir in (('fp32', fp32_model), ('int8', int8_model)):
+        recognizer = TextRecognizer(_predictor_args(rec_model_dir=model_dir, precision=precision))
+        # 预热
+        recognizer(images[:config.REC_BATCH_NUM])
+        start = time.time()
+        results[precision], _ = recognizer(images)
+        elapsed[precision] = (time.time() - start) / len(images)
+    pairs = list(zip(results['fp32'], results['int8']))
+    return {'images': len(images), 'fp32_model': fp32_model, 'int8_model': int8_model,
+            'fp32_ms': round(elapsed['fp32'] * 1000, 2), 'int8_ms': round(elapsed['int8'] * 1000, 2),
+            'speedup': round(elapsed['fp32'] / max(elapsed['int8'], 1e-9), 2),
+            'exact_match': round(sum(a[0] == b[0] for a, b in pairs) / len(pairs), 4),
+            'similarity': round(sum(ratio(a[0], b[0]) for a, b in pairs) / len(pairs), 4),
+            'fp32_score': round(float(np.mean([a[1] for a, _ in pairs])), 4),
+            'int8_score': round(float(np.mean([b[1] for _, b in pairs])), 4),
+            'mismatches': [{'fp32': a[0], 'int8': b[0]} for a, b in pairs if a[0] != b[0]][:50]}
+
+
+def compare(eval_dir, det_model=DEFAULT_DET_MODEL, rec_model=DEFAULT_REC_MODEL, report_path=None):
+    """
+    在测试集上对比FP32与INT8模型：检测框的召回率/精确率(以FP32结果为基准)、识别结果的一致率与相似度，以及每张图的平均耗时
+    :param eval_dir 测试集目录，结构与collect的输出相同
+    :return 报告
+    """
+    report = {'cpu_threads': config.CPU_THREADS, 'mkldnn': config.ENABLE_MKLDNN}
+    det_images = _read_images(os.path.join(eval_dir, 'det'))
+    if len(det_images) > 0 and os.path.exists(int8_model_dir(det_model)):
+        report['det'] = compare_det(det_images, det_model, int8_model_dir(det_model))
+    rec_images = _read_images(os.path.join(eval_dir, 'rec'))
+    if len(rec_images) > 0 and os.path.exists(int8_model_dir(rec_model)):
+        report['rec'] = compare_rec(rec_images, rec_model, int8_model_dir(rec_model))
+    if report_path is not None:
+        with open(report_path, mode='w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='int8 post-training quantization of the det/rec models')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    collect_parser = subparsers.add_parser('collect', help='capture calibration images from videos')
+    collect_parser.add_argument('source', help='video directory, manifest file (.txt/.json) or video path')
+    collect_parser.add_argument('output', help='output directory')
+    collect_parser.add_argument('--det-model', default=DEFAULT_DET_MODEL, help='det model used to find text lines')
+    collect_parser.add_argument('--interval', type=float, default=1.0, help='seconds between captured frames')
+    collect_parser.add_argument('--max-samples', type=int, default=500, help='maximum number of subtitle areas')
+    quantize_parser = subparsers.add_parser('quantize', help='quantize the det/rec models')
+    quantize_parser.add_argument('calib', help='calibration directory created by collect')
+    quantize_parser.add_argument('--det-model', default=DEFAULT_DET_MODEL, help='det model directory')
+    quantize_parser.add_argument('--rec-model', default=DEFAULT_REC_MODEL, help='rec model directory')
+    quantize_parser.add_argument('--batch-nums', type=int, default=None, help='number of calibration batches')
+    quantize_parser.add_argument('--algo', default='hist', help='hist, KL, avg, abs_max or mse')
+    compare_parser = subparsers.add_parser('compare', help='compare fp32 and int8 models')
+    compare_parser.add_argument('eval', help='evaluation directory created by collect')
+    compare_parser.add_argument('--det-model', default=DEFAULT_DET_MODEL, help='fp32 det model directory')
+    compare_parser.add_argument('--rec-model', default=DEFAULT_REC_MODEL, help='fp32 rec model directory')
+    compare_parser.add_argument('--report', default=None, help='path of the json report')
+    args = parser.parse_args(argv)
+    if args.command == 'collect':
+        collect(args.source, args.output, args.det_model, args.interval, args.max_samples)
+    elif args.command == 'quantize':
+        quantize(args.det_model, 'det', args.calib, batch_nums=args.batch_nums, algo=args.algo)
+        quantize(args.rec_model, 'rec', args.calib, batch_nums=args.batch_nums, algo=args.algo)
+    else:
+        report_path = args.report or os.path.join(args.eval, 'quantize_report.json')
+        report = compare(args.eval, args.det_model, args.rec_model, report_path)
+        for kind in ('det', 'rec'):
+            if kind in report:
+                item = report[kind]
+                accuracy = f"box recall: {item['box_recall']}, box precision: {item['box_precision']}" \
+                    if kind == 'det' else f"exact match: {item['exact_match']}, similarity: {item['similarity']}"
+                print(f"{kind}: fp32 {item['fp32_ms']}ms, int8 {item['int8_ms']}ms, speedup {item['speedup']}x, "
+                      f"{accuracy}")
+        print(f'report: {report_path}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
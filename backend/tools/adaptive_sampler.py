@@ -0,0 +1,103 @@
+"""
+自适应采样
+解码时按可变间隔对字幕区域取样比较签名：字幕区域刚发生变化时密集采样，长时间稳定时逐渐放宽采样间隔；
+两个采样点的签名不同时，在两点之间缓存的字幕区域上二分查找，定位字幕出现/消失的准确帧号，
+每个稳定的字幕段只需要识别一次
+"""
+from tools.change_detector import SubtitleChangeDetector
+
+
+class AdaptiveFrameSampler:
+    def __init__(self, change_detector=None, min_interval=2, max_interval=25):
+        """
+        :param change_detector 用于计算字幕区域签名与差异的SubtitleChangeDetector
+        :param min_interval 字幕区域发生变化后的采样间隔(帧)
+        :param max_interval 字幕区域稳定时的最大采样间隔(帧)，比该间隔更短且前后画面相同的字幕可能被漏掉
+        """
+        self.change_detector = change_detector or SubtitleChangeDetector()
+        self.min_interval = max(int(min_interval), 1)
+        self.max_interval = max(int(max_interval), self.min_interval)
+        self.interval = self.min_interval
+        # 上一个采样点 (frame_no帧号, region字幕区域, origin裁剪原点, signature签名)
+        self._last_sample = None
+        # 上一个采样点之后缓存的字幕区域，元素为 (frame_no, region, origin)
+        self._window = []
+        # 统计信息
+        self.frames = 0
+        self.samples = 0
+        self.signatures = 0
+        self.transitions = 0
+
+    def push(self, frame_no, region, origin=(0, 0)):
+        """
+        输入一帧的字幕区域，帧号需要连续递增
+        :param frame_no 帧号
+        :param region 字幕区域(可以是视频帧的切片)
+        :param origin 字幕区域左上角在原视频帧中的坐标(y, x)
+        :return 新字幕段的开始帧列表，元素为 (frame_no, region, origin)
+        """
+        self.frames += 1
+        # 缓存的是视频帧中的一小块区域，复制一份避免引用整帧
+        item = (frame_no, region.copy(), origin)
+        if self._last_sample is None:
+            self._last_sample = item + (self._signature(item[1]),)
+            self.samples += 1
+            self.transitions += 1
+            return [item]
+        self._window.append(item)
+        if len(self._window) < self.interval:
+            return []
+        return self._sample()
+
+    def finish(self):
+        """
+        所有视频帧输入完成，比较剩余的缓存帧
+        """
+        if len(self._window) == 0:
+            return []
+        return self._sample()
+
+    def stats(self):
+        return {'frames': self.frames, 'samples': self.samples, 'signatures': self.signatures,
+                'transitions': self.transitions}
+
+    def _signature(self, region):
+        self.signatures += 1
+        return self.change_detector.signature(region)
+
+    def _changed(self, signature1, signature2):
+        return self.change_detector.difference(signature1, signature2) > self.change_detector.threshold
+
+    def _sample(self):
+        self.samples += 1
+        items = [self._last_sample[:3]] + self._window
+        # 二分查找过程中按需计算签名，下标为items中的位置
+        signatures = {0: self._last_sample[3], len(items) - 1: self._signature(self._window[-1][1])}
+        transitions = []
+        if self._changed(signatures[0], signatures[len(items) - 1]):
+            transitions = [items[i] for i in self._bisect(items, signatures, 0, len(items) - 1)]
+            self.transitions += len(transitions)
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * 2, self.max_interval)
+        self._last_sample = items[-1] + (signatures[len(items) - 1],)
+        self._window = []
+        return transitions
+
+    def _bisect(self, items, signatures, lo, hi):
+        """
+        在items[lo]与items[hi]签名不同的前提下，查找其间所有发生变化的位置
+        :return 变化后第一帧在items中的下标列表
+        """
+        if hi - lo == 1:
+            return [hi]
+        mid = (lo + hi) // 2
+        if mid not in signatures:
+            signatures[mid] = self._signature(items[mid][1])
+        result = []
+        if self._changed(signatures[lo], signatures[mid]):
+            result.extend(self._bisect(items, signatures, lo, mid))
+        if self._changed(signatures[mid], signatures[hi]):
+            result.extend(self._bisect(items, signatures, mid, hi))
+        # 渐变(淡入淡出)时两端不同但每一半都低于阈值，以后一个采样点作为变化位置
+        return result or [hi]
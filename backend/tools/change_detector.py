@@ -0,0 +1,61 @@
+"""
+字幕区域变化检测
+在送入OCR之前比较字幕区域与上一次OCR时的差异，画面没有变化时直接复用上一次的OCR结果
+"""
+import cv2
+import numpy as np
+
+
+class SubtitleChangeDetector:
+    def __init__(self, threshold=0.002, pixel_threshold=20, scale=4):
+        """
+        :param threshold 变化像素占比阈值，超过该比例认为字幕区域发生了变化
+        :param pixel_threshold 灰度差超过该值的像素视为变化像素
+        :param scale 计算签名前的降采样倍数
+        """
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.scale = scale
+        # 上一次送去OCR的字幕区域签名
+        self.last_signature = None
+        # 统计信息
+        self.checked = 0
+        self.skipped = 0
+
+    def signature(self, region):
+        """
+        字幕区域的签名：降采样后的灰度图
+        """
+        if region.ndim == 3:
+            region = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        h, w = region.shape[:2]
+        size = (max(w // self.scale, 1), max(h // self.scale, 1))
+        return cv2.resize(region, size, interpolation=cv2.INTER_AREA)
+
+    def difference(self, signature1, signature2):
+        """
+        两个签名之间变化像素的占比
+        """
+        if signature1.shape != signature2.shape:
+            return 1.0
+        diff = cv2.absdiff(signature1, signature2)
+        return np.count_nonzero(diff > self.pixel_threshold) / diff.size
+
+    def is_same(self, region):
+        """
+        判断字幕区域是否与上一次送去OCR的区域相同，不同时将其作为新的比较基准
+        """
+        self.checked += 1
+        signature = self.signature(region)
+        if self.last_signature is not None and \
+                self.difference(signature, self.last_signature) <= self.threshold:
+            self.skipped += 1
+            return True
+        self.last_signature = signature
+        return False
+
+    def reset(self):
+        self.last_signature = None
+
+    def stats(self):
+        return {'checked': self.checked, 'skipped': self.skipped}
@@ -0,0 +1,82 @@
+"""
+提取进度检查点
+OCR进程把识别结果按帧号区间分段追加写入日志文件，每段写完后flush并fsync，段头记录该段覆盖的帧号区间；
+进程被杀或崩溃后重新运行时，读取所有完整的段，从最后一个已提交的帧之后继续提取
+"""
+import os
+import struct
+from tools.raw_store import RawSubtitleStore, RECORD_HEADER
+
+# 段头: start开始帧号, end已提交到的帧号(包含), count记录数量，之后紧跟count条RawSubtitleStore格式的记录
+SEGMENT_HEADER = struct.Struct('<iiI')
+
+
+class SegmentJournal:
+    def __init__(self, path, committed_frame_no=0):
+        """
+        :param path 日志文件路径，以追加方式打开
+        :param committed_frame_no 已经提交到的帧号，新的段从其下一帧开始
+        """
+        self.path = path
+        self._file = open(path, mode='ab')
+        self.committed_frame_no = committed_frame_no
+        # 尚未提交的记录
+        self._records = []
+
+    def append(self, frame_no, box, text, score):
+        self._records.append((int(frame_no), tuple(int(i) for i in box), text, float(score)))
+
+    def commit(self, frame_no):
+        """
+        提交帧号不大于frame_no的全部记录，调用前需要保证这些帧都已经识别完成
+        """
+        if frame_no <= self.committed_frame_no:
+            return
+        chunks = [SEGMENT_HEADER.pack(self.committed_frame_no + 1, frame_no, len(self._records))]
+        for record_frame_no, box, text, score in self._records:
+            data = text.encode('utf-8')
+            chunks.append(RECORD_HEADER.pack(record_frame_no, *box, score, len(data)))
+            chunks.append(data)
+        self._file.write(b''.join(chunks))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.committed_frame_no = frame_no
+        self._records.clear()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def load(path):
+        """
+        读取日志中所有完整的段，末尾不完整的段(写入时进程退出)会被忽略
+        :return (store已提交的记录RawSubtitleStore, committed_frame_no已提交到的帧号，没有完整的段时为None)
+        """
+        store = RawSubtitleStore()
+        committed_frame_no = None
+        with open(path, mode='rb') as f:
+            buffer = f.read()
+        offset = 0
+        while offset + SEGMENT_HEADER.size <= len(buffer):
+            _, end, count = SEGMENT_HEADER.unpack_from(buffer, offset)
+            cursor = offset + SEGMENT_HEADER.size
+            records = []
+            for _ in range(count):
+                if cursor + RECORD_HEADER.size > len(buffer):
+                    break
+                frame_no, xmin, xmax, ymin, ymax, score, size = RECORD_HEADER.unpack_from(buffer, cursor)
+                cursor += RECORD_HEADER.size
+                if cursor + size > len(buffer):
+                    break
+                records.append((frame_no, (xmin, xmax, ymin, ymax), buffer[cursor:cursor + size].decode('utf-8'),
+                                score))
+                cursor += size
+            if len(records) < count:
+                break
+            for record in records:
+                store.append(*record)
+            committed_frame_no = end
+            offset = cursor
+        return store, committed_frame_no
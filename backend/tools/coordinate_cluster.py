@@ -0,0 +1,62 @@
+"""
+文本框坐标聚类
+检测框检测的结果不是一致的，相同位置文字的坐标可能一次检测为(255,123,456,789)，另一次检测为(253,122,456,799)，
+将坐标按容忍的像素偏差划分网格，每个坐标只需要与相邻网格中的类别代表坐标比较，近似线性时间内完成聚类
+"""
+import itertools
+import numpy as np
+
+# 四维网格中相邻(含自身)网格的偏移
+NEIGHBOUR_OFFSETS = list(itertools.product((-1, 0, 1), repeat=4))
+
+
+def cluster_coordinates(coordinates, tolerance_x, tolerance_y):
+    """
+    将相似的坐标聚为一类，xmin,xmax的差值都小于tolerance_x且ymin,ymax的差值都小于tolerance_y时认为相似
+    出现次数越多的坐标越优先作为类别的代表坐标
+    :param coordinates 坐标列表或数组，每个坐标为 (xmin, xmax, ymin, ymax)
+    :param tolerance_x 横向容忍的像素偏差
+    :param tolerance_y 纵向容忍的像素偏差
+    :return (labels每个坐标所属的类别, centers每个类别的代表坐标, counts每个类别的坐标数量)，类别按数量从多到少排列
+    """
+    coordinates = np.asarray(coordinates, dtype=np.int64).reshape(-1, 4)
+    if len(coordinates) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 4), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    tolerance = (tolerance_x, tolerance_x, tolerance_y, tolerance_y)
+    # 完全相同的坐标只需要处理一次
+    unique, inverse, unique_counts = np.unique(coordinates, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    # 网格大小等于容忍偏差，相似的坐标一定落在相同或相邻的网格中
+    cells = unique // np.array(tolerance, dtype=np.int64)
+    unique_list = unique.tolist()
+    cell_list = cells.tolist()
+    # 网格 -> 落在其中的类别编号
+    grid = {}
+    # 每个类别的代表坐标在unique中的下标
+    centers = []
+    unique_labels = np.empty(len(unique), dtype=np.int64)
+    for u in np.argsort(-unique_counts, kind='stable').tolist():
+        coordinate = unique_list[u]
+        cell = cell_list[u]
+        label = -1
+        for offset in NEIGHBOUR_OFFSETS:
+            neighbour = (cell[0] + offset[0], cell[1] + offset[1], cell[2] + offset[2], cell[3] + offset[3])
+            for candidate in grid.get(neighbour, ()):
+                center = unique_list[centers[candidate]]
+                if all(abs(a - b) < t for a, b, t in zip(coordinate, center, tolerance)):
+                    label = candidate
+                    break
+            if label >= 0:
+                break
+        if label < 0:
+            label = len(centers)
+            centers.append(u)
+            grid.setdefault(tuple(cell), []).append(label)
+        unique_labels[u] = label
+    labels = unique_labels[inverse]
+    counts = np.bincount(labels, minlength=len(centers))
+    # 按类别中的坐标数量从多到少重新编号
+    order = np.argsort(-counts, kind='stable')
+    relabel = np.empty_like(order)
+    relabel[order] = np.arange(len(order))
+    return relabel[labels], unique[np.array(centers)][order], counts[order]
@@ -0,0 +1,145 @@
+"""
+DB检测预处理
+将DetResizeForTest -> NormalizeImage -> ToCHWImage -> copy合并为一步：缩放结果写入按尺寸复用的uint8缓冲区，
+再通过每个通道256项的查找表完成归一化，直接写入预先分配的float32 NCHW输入缓冲区，
+不再产生float32的HWC临时数组、转置后的副本以及送入预测器前的拷贝
+"""
+import time
+import cv2
+import numpy as np
+
+
+class DetPreprocessor:
+    def __init__(self, limit_side_len=960, limit_type='max', image_shape=None, scale=1. / 255.,
+                 mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225), max_cached_shapes=8):
+        """
+        参数与DetResizeForTest、NormalizeImage一致
+        :param limit_side_len 缩放时限制的边长
+        :param limit_type 'max'限制长边，'min'限制短边，'resize_long'长边缩放到limit_side_len
+        :param image_shape 固定的输入尺寸 (高, 宽)，不为None时忽略limit_side_len
+        :param max_cached_shapes 最多缓存多少种尺寸的缓冲区，超出时清空重新分配
+        """
+        self.limit_side_len = limit_side_len
+        self.limit_type = limit_type
+        self.image_shape = image_shape
+        # 查找表 lut[c][v] = (v * scale - mean[c]) / std[c]，与NormalizeImage按float32计算的结果一致
+        values = np.arange(256, dtype=np.float32)
+        self.lut = np.stack([(values * np.float32(scale) - np.float32(m)) / np.float32(s)
+                             for m, s in zip(mean, std)])
+        self.max_cached_shapes = max_cached_shapes
+        # 缩放结果缓冲区，键为 (resize_h, resize_w)
+        self._resized = {}
+        # NCHW输入缓冲区，键为 (batch_size, resize_h, resize_w)
+        self._inputs = {}
+
+    @staticmethod
+    def supports(img):
+        """
+        只有3通道uint8图像可以使用查找表归一化
+        """
+        return img is not None and img.dtype == np.uint8 and img.ndim == 3 and img.shape[2] == 3
+
+    def resize_shape(self, h, w):
+        """
+        计算缩放后的尺寸，与DetResizeForTest一致
+        :return (resize_h, resize_w)，尺寸无效时返回None
+        """
+        if self.image_shape is not None:
+            resize_h, resize_w = int(self.image_shape[0]), int(self.image_shape[1])
+            return (resize_h, resize_w) if resize_h > 0 and resize_w > 0 else None
+        limit_side_len = self.limit_side_len
+        if self.limit_type == 'max':
+            ratio = float(limit_side_len) / max(h, w) if max(h, w) > limit_side_len else 1.
+        elif self.limit_type == 'min':
+            ratio = float(limit_side_len) / min(h, w) if min(h, w) < limit_side_len else 1.
+        elif self.limit_type == 'resize_long':
+            ratio = float(limit_side_len) / max(h, w)
+        else:
+            raise Exception('not support limit type, image ')
+        resize_h = max(int(round(int(h * ratio) / 32) * 32), 32)
+        resize_w = max(int(round(int(w * ratio) / 32) * 32), 32)
+        return resize_h, resize_w
+
+    def input_buffer(self, batch_size, resize_h, resize_w):
+        """
+        获取复用的NCHW输入缓冲区，内容在下一次获取同一尺寸的缓冲区时被覆盖
+        """
+        return self._buffer(self._inputs, (batch_size, resize_h, resize_w), (batch_size, 3, resize_h, resize_w),
+                            np.float32)
+
+    def fill(self, img, out):
+        """
+        将一张图像缩放、归一化并转置后写入out
+        :param img 3通道uint8图像(HWC)
+        :param out 形状为 (3, resize_h, resize_w) 的float32连续数组
+        :return shape [src_h, src_w, ratio_h, ratio_w]，与DetResizeForTest输出的shape一致
+        """
+        h, w = img.shape[:2]
+        resize_h, resize_w = out.shape[1:]
+        if (resize_h, resize_w) == (h, w):
+            resized = img
+        else:
+            resized = self._buffer(self._resized, (resize_h, resize_w), (resize_h, resize_w, 3), np.uint8)
+            cv2.resize(img, (resize_w, resize_h), dst=resized)
+        for c in range(3):
+            # uint8的取值不会越界，mode='clip'避免np.take为out额外分配缓冲
+            np.take(self.lut[c], resized[:, :, c], out=out[c], mode='clip')
+        return np.array([h, w, resize_h / float(h), resize_w / float(w)])
+
+    def __call__(self, img):
+        """
+        预处理一张图像
+        :return (input输入缓冲区 (1, 3, H, W), shape_list (1, 4))，尺寸无效时返回 (None, None)
+        """
+        size = self.resize_shape(*img.shape[:2])
+        if size is None:
+            return None, None
+        batch = self.input_buffer(1, *size)
+        shape = self.fill(img, batch[0])
+        return batch, shape[np.newaxis]
+
+    def _buffer(self, cache, key, shape, dtype):
+        buffer = cache.get(key)
+        if buffer is None:
+            if len(cache) >= self.max_cached_shapes:
+                cache.clear()
+            buffer = cache[key] = np.empty(shape, dtype=dtype)
+        return buffer
+
+
+def _legacy_preprocess(img, limit_side_len, limit_type):
+    """
+    原TextDetector的预处理流程(DetResizeForTest -> NormalizeImage -> ToCHWImage -> expand_dims -> copy)，仅用于对比测试
+    """
+    h, w = img.shape[:2]
+    resize_h, resize_w = DetPreprocessor(limit_side_len, limit_type).resize_shape(h, w)
+    resized = cv2.resize(img, (resize_w, resize_h))
+    mean = np.array([0.485, 0.456, 0.406]).reshape((1, 1, 3)).astype('float32')
+    std = np.array([0.229, 0.224, 0.225]).reshape((1, 1, 3)).astype('float32')
+    norm_img = (resized.astype('float32') * np.float32(1. / 255.) - mean) / std
+    norm_img = norm_img.transpose((2, 0, 1))
+    return np.expand_dims(norm_img, axis=0).copy()
+
+
+if __name__ == '__main__':
+    # 与原预处理流程对比每帧耗时与结果
+    rng = np.random.default_rng(0)
+    cases = [('1080p frame', (1080, 1920, 3), 960, 'max'),
+             ('subtitle band', (200, 1920, 3), 640, 'max')]
+    rounds = 50
+    for name, shape, limit_side_len, limit_type in cases:
+        frames = [rng.integers(0, 256, shape, dtype=np.uint8) for _ in range(4)]
+        preprocessor = DetPreprocessor(limit_side_len, limit_type)
+        start = time.time()
+        for i in range(rounds):
+            legacy = _legacy_preprocess(frames[i % len(frames)], limit_side_len, limit_type)
+        legacy_time = (time.time() - start) / rounds
+        start = time.time()
+        for i in range(rounds):
+            fused, _ = preprocessor(frames[i % len(frames)])
+        fused_time = (time.time() - start) / rounds
+        legacy = _legacy_preprocess(frames[0], limit_side_len, limit_type)
+        fused, _ = preprocessor(frames[0])
+        print(f'{name} {shape[1]}x{shape[0]} -> {fused.shape[3]}x{fused.shape[2]}: '
+              f'legacy: {legacy_time * 1000:.2f}ms, fused: {fused_time * 1000:.2f}ms per frame, '
+              f'max difference: {np.max(np.abs(legacy - fused)):.6f}')
@@ -0,0 +1,63 @@
+"""
+视频帧时间戳索引
+在提取视频帧的过程中记录每一帧的显示时间戳(PTS)，生成字幕时直接按帧号查表，
+不必为每条字幕重新打开视频、seek并解码；按实际解码时间戳记录，可变帧率(VFR)视频同样适用
+"""
+import os
+import numpy as np
+
+
+class FramePtsIndex:
+    def __init__(self, frame_count=0):
+        """
+        :param frame_count 视频总帧数(可以不准确，超出时自动扩容)
+        """
+        # 下标为从0开始的帧序号，值为毫秒时间戳，未记录的帧为NaN
+        self.pts = np.full(max(int(frame_count), 0), np.nan, dtype=np.float64)
+
+    def record(self, index, ms):
+        """
+        记录一帧的时间戳
+        :param index 帧序号，从0开始
+        :param ms 该帧的时间戳(毫秒)
+        """
+        if index >= len(self.pts):
+            grown = np.full(max(index + 1, len(self.pts) * 2), np.nan, dtype=np.float64)
+            grown[:len(self.pts)] = self.pts
+            self.pts = grown
+        self.pts[index] = ms
+
+    def lookup(self, index):
+        """
+        查询一帧的时间戳
+        :param index 帧序号，从0开始
+        :return 毫秒时间戳，没有记录时返回None
+        """
+        if index < 0 or index >= len(self.pts) or np.isnan(self.pts[index]):
+            return None
+        return float(self.pts[index])
+
+    def recorded_count(self, start=0):
+        """
+        从第start + 1帧开始连续记录了时间戳的最后一帧的帧号(帧号从1开始)，start为0时即从第一帧开始连续记录的帧数
+        :param start 开始统计的位置，分段提取时为该段第一帧之前的帧号
+        :return start之后的第一帧未记录时返回start
+        """
+        missing = np.flatnonzero(np.isnan(self.pts[start:]))
+        return start + int(missing[0]) if len(missing) > 0 else max(len(self.pts), start)
+
+    def save(self, path):
+        # 先写入临时文件再替换，写入过程中进程退出也不会破坏已保存的索引
+        with open(f'{path}.tmp', mode='wb') as f:
+            np.save(f, self.pts)
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        读取保存的索引，文件不存在时返回空索引
+        """
+        index = cls()
+        if os.path.exists(path):
+            index.pts = np.load(path)
+        return index
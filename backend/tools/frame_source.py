@@ -0,0 +1,112 @@
+"""
+顺序解码的视频帧源
+按帧号(或时间)取帧时尽量向前顺序解码，最近解码的帧保存在有界环形缓冲中，
+只有当请求的帧落在缓冲之前(或距离当前位置过远)时才回退为seek
+"""
+from collections import deque
+import cv2
+
+
+class SequentialFrameSource:
+    def __init__(self, video_path, buffer_size=8, max_grab=250):
+        """
+        :param video_path 视频路径
+        :param buffer_size 环形缓冲能保存的最近帧数量
+        :param max_grab 向前跳帧时最多连续grab的帧数，超过则直接seek
+        """
+        self.cap = cv2.VideoCapture(video_path)
+        # 缓冲内容为 (frame_no帧号, ms时间戳, frame视频帧)
+        self.buffer = deque(maxlen=buffer_size)
+        self.max_grab = max_grab
+        # 最后一帧已解码帧的帧号，帧号从1开始，与SubtitleExtractor中的current_frame_no一致
+        self.frame_no = 0
+        # 当前解码位置的时间戳
+        self.ms = 0.0
+        # 统计信息
+        self.seek_count = 0
+        self.decode_count = 0
+        self.hit_count = 0
+
+    def read(self, frame_no):
+        """
+        读取指定帧号的视频帧
+        :param frame_no 帧号，从1开始
+        :return (ret, frame)
+        """
+        if frame_no < 1:
+            return False, None
+        cached = self._lookup(lambda item: item[0] == frame_no)
+        if cached is not None:
+            self.hit_count += 1
+            return True, cached[2]
+        # 请求的帧在当前位置之前或距离过远，只能seek
+        if frame_no <= self.frame_no or frame_no - self.frame_no > self.max_grab:
+            self._seek(cv2.CAP_PROP_POS_FRAMES, frame_no - 1)
+        while self.frame_no < frame_no:
+            # 只有最后buffer_size帧需要解码出图像，其余帧只需grab
+            retrieve = frame_no - self.frame_no <= self.buffer.maxlen
+            if not self._decode_next(retrieve):
+                return False, None
+        item = self.buffer[-1] if self.buffer else None
+        if item is None or item[0] != frame_no:
+            return False, None
+        return True, item[2]
+
+    def read_at_ms(self, ms):
+        """
+        读取时间戳不早于ms的第一帧，等价于cap.set(cv2.CAP_PROP_POS_MSEC, ms)后cap.read()
+        :param ms 毫秒
+        :return (ret, frame)
+        """
+        if self.buffer and self.buffer[0][1] <= ms <= self.buffer[-1][1]:
+            cached = self._lookup(lambda item: item[1] >= ms)
+            if cached is not None:
+                self.hit_count += 1
+                return True, cached[2]
+        if (self.buffer and ms < self.buffer[0][1]) or (not self.buffer and ms < self.ms):
+            self._seek(cv2.CAP_PROP_POS_MSEC, ms)
+        grabbed = 0
+        while True:
+            if grabbed > self.max_grab:
+                self._seek(cv2.CAP_PROP_POS_MSEC, ms)
+                grabbed = 0
+            if not self._decode_next(True):
+                return False, None
+            grabbed += 1
+            if self.buffer[-1][1] >= ms:
+                return True, self.buffer[-1][2]
+
+    def release(self):
+        self.buffer.clear()
+        self.cap.release()
+
+    def stats(self):
+        return {'decoded': self.decode_count, 'seeks': self.seek_count, 'hits': self.hit_count}
+
+    def _lookup(self, predicate):
+        for item in self.buffer:
+            if predicate(item):
+                return item
+        return None
+
+    def _decode_next(self, retrieve):
+        if retrieve:
+            ret, frame = self.cap.read()
+        else:
+            ret, frame = self.cap.grab(), None
+        if not ret:
+            return False
+        self.frame_no += 1
+        self.ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        self.decode_count += 1
+        if retrieve:
+            self.buffer.append((self.frame_no, self.ms, frame))
+        return True
+
+    def _seek(self, prop, value):
+        self.seek_count += 1
+        self.buffer.clear()
+        self.cap.set(prop, value)
+        # seek后以解码器报告的位置为准
+        self.frame_no = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        self.ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
@@ -0,0 +1,67 @@
+"""
+基于共享内存的视频帧传输
+主进程将解码好的视频帧(已裁剪至字幕区域)写入共享内存中的环形槽位，
+队列中只传递槽位编号、图像尺寸与裁剪原点，OCR进程直接在共享内存上读取，无需pickle整张BGR图像
+"""
+import queue
+from collections import namedtuple
+from multiprocessing import Queue
+from multiprocessing import shared_memory
+import numpy as np
+
+# 帧引用: slot槽位编号, shape图像尺寸, origin裁剪区域左上角在原视频帧中的坐标(y, x)
+FrameRef = namedtuple('FrameRef', 'slot shape origin')
+
+
+class SharedFrameRing:
+    def __init__(self, slot_count, slot_size):
+        """
+        :param slot_count 槽位数量，同时在途的视频帧数量上限
+        :param slot_size 每个槽位的字节数，一般为 帧高 * 帧宽 * 3
+        """
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_count * slot_size)
+        # 空闲槽位队列，槽位被OCR进程用完后放回，实现槽位复用
+        self.free_slots = Queue()
+        for slot in range(slot_count):
+            self.free_slots.put(slot)
+
+    def put(self, frame, origin=(0, 0), timeout=None):
+        """
+        将视频帧写入一个空闲槽位
+        :param frame 视频帧(可以是原始帧的切片)
+        :param origin 视频帧左上角在原视频帧中的坐标(y, x)
+        :param timeout 等待空闲槽位的超时时间，超时返回None
+        :return FrameRef
+        """
+        if frame.nbytes > self.slot_size:
+            raise ValueError(f'frame of {frame.nbytes} bytes does not fit slot of {self.slot_size} bytes')
+        try:
+            slot = self.free_slots.get(block=True, timeout=timeout)
+        except queue.Empty:
+            return None
+        view = self._view(slot, frame.shape)
+        np.copyto(view, frame)
+        return FrameRef(slot, frame.shape, tuple(origin))
+
+    def get(self, frame_ref):
+        """
+        获取帧引用对应的视频帧，返回的是共享内存上的视图，release之前有效
+        """
+        return self._view(frame_ref.slot, frame_ref.shape)
+
+    def release(self, frame_ref):
+        """
+        归还槽位
+        """
+        self.free_slots.put(frame_ref.slot)
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+    def _view(self, slot, shape):
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_size)
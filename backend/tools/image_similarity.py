@@ -0,0 +1,87 @@
+"""
+图像相似度
+直接在BGR图像(ndarray)上计算：区域插值降采样 -> 各通道取平均得到灰度向量 -> 归一化后求点积(余弦相似度)
+"""
+import time
+import cv2
+import numpy as np
+
+
+def thumbnail_vector(image, size=(64, 64)):
+    """
+    将图像统一缩放为size大小，并展开为各通道平均值组成的向量
+    :param image BGR或灰度图像
+    :param size 缩放后的大小 (宽, 高)
+    """
+    thumbnail = cv2.resize(image, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    if thumbnail.ndim == 3:
+        thumbnail = thumbnail.mean(axis=2)
+    return thumbnail.reshape(-1)
+
+
+def _normalise(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    # 全黑图像的范数为0，避免除0
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def compute_image_similarity(image1, image2, size=(64, 64)):
+    """
+    计算两张图片的余弦相似度
+    """
+    a, b = _normalise(np.stack([thumbnail_vector(image1, size), thumbnail_vector(image2, size)]))
+    return float(np.dot(a, b))
+
+
+def compute_image_similarity_batch(images, reference, size=(64, 64)):
+    """
+    批量计算多张图片与同一张参考图片的余弦相似度
+    :param images 图片列表
+    :param reference 参考图片
+    :return 与images一一对应的相似度数组
+    """
+    if len(images) == 0:
+        return np.zeros(0, dtype=np.float32)
+    vectors = _normalise(np.stack([thumbnail_vector(image, size) for image in images]))
+    return vectors @ _normalise(thumbnail_vector(reference, size)[np.newaxis])[0]
+
+
+def _legacy_image_similarity(image1, image2):
+    """
+    原SubtitleExtractor._compute_image_similarity的实现(逐像素转换为python列表)，仅用于对比测试
+    """
+    from PIL import Image
+    vectors = []
+    norms = []
+    for image in (image1, image2):
+        image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)).resize((64, 64), Image.LANCZOS)
+        vector = [np.average(pixel_tuple) for pixel_tuple in image.getdata()]
+        vectors.append(vector)
+        norms.append(np.linalg.norm(vector, 2))
+    a, b = vectors
+    a_norm, b_norm = norms
+    return np.dot(a / a_norm, b / b_norm)
+
+
+if __name__ == '__main__':
+    # 与原实现对比速度与结果
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8) for _ in range(8)]
+    reference = frames[0]
+    rounds = 5
+    start = time.time()
+    for _ in range(rounds):
+        legacy = [_legacy_image_similarity(frame, reference) for frame in frames]
+    legacy_time = (time.time() - start) / rounds
+    start = time.time()
+    for _ in range(rounds):
+        pairwise = [compute_image_similarity(frame, reference) for frame in frames]
+    pairwise_time = (time.time() - start) / rounds
+    start = time.time()
+    for _ in range(rounds):
+        batch = compute_image_similarity_batch(frames, reference)
+    batch_time = (time.time() - start) / rounds
+    print(f'legacy: {legacy_time * 1000:.1f}ms, pairwise: {pairwise_time * 1000:.1f}ms, '
+          f'batch: {batch_time * 1000:.1f}ms for {len(frames)} frames')
+    print(f'max difference to legacy: {np.max(np.abs(np.array(legacy) - batch)):.4f}')
@@ -30,6 +30,7 @@ from ppocr.utils.logging import get_logger
 from ppocr.utils.utility import get_image_file_list, check_and_read_gif
 from ppocr.data import create_operators, transform
 from ppocr.postprocess import build_post_process
+from tools.det_preprocess import DetPreprocessor
 import json
 logger = get_logger()
 
@@ -67,6 +68,7 @@ class TextDetector(object):
             postprocess_params["unclip_ratio"] = args.det_db_unclip_ratio
             postprocess_params["use_dilation"] = args.use_dilation
             postprocess_params["score_mode"] = args.det_db_score_mode
+            postprocess_params["axis_aligned"] = args.det_db_axis_aligned
         elif self.det_algorithm == "EAST":
             postprocess_params['name'] = 'EASTPostProcess'
             postprocess_params["score_thresh"] = args.det_east_score_thresh
@@ -121,13 +123,21 @@ class TextDetector(object):
 
         if self.use_onnx:
             img_h, img_w = self.input_tensor.shape[2:]
-            if img_h is not None and img_w is not None and img_h > 0 and img_w > 0:
+            # 动态尺寸导出时为None或符号名，此时按limit_side_len缩放
+            if isinstance(img_h, int) and isinstance(img_w, int) and img_h > 0 and img_w > 0:
                 pre_process_list[0] = {
                     'DetResizeForTest': {
                         'image_shape': [img_h, img_w]
                     }
                 }
         self.preprocess_op = create_operators(pre_process_list)
+        # DB检测使用合并的预处理，缩放、归一化与转置一次完成，直接写入复用的输入缓冲区
+        self.fused_preprocess = None
+        resize_params = pre_process_list[0]['DetResizeForTest']
+        if self.det_algorithm == "DB" and getattr(args, 'det_fused_preprocess', False):
+            self.fused_preprocess = DetPreprocessor(limit_side_len=resize_params.get('limit_side_len'),
+                                                    limit_type=resize_params.get('limit_type', 'min'),
+                                                    image_shape=resize_params.get('image_shape'))
 
         if args.benchmark:
             import auto_log
@@ -189,24 +199,95 @@ class TextDetector(object):
         return dt_boxes
 
     def __call__(self, img):
-        ori_im = img.copy()
-        data = {'image': img}
+        # 预处理不会修改输入图像，只需记录原图尺寸
+        ori_shape = img.shape
 
         st = time.time()
 
         if self.args.benchmark:
             self.autolog.times.start()
 
-        data = transform(data, self.preprocess_op)
-        img, shape_list = data
+        img, shape_list = self._preprocess(img)
         if img is None:
             return None, 0
-        img = np.expand_dims(img, axis=0)
-        shape_list = np.expand_dims(shape_list, axis=0)
-        img = img.copy()
 
         if self.args.benchmark:
             self.autolog.times.stamp()
+        outputs = self._run(img)
+
+        #self.predictor.try_shrink_memory()
+        post_result = self.postprocess_op(self._build_preds(outputs), shape_list)
+        dt_boxes = self._filter_boxes(post_result[0]['points'], ori_shape)
+
+        if self.args.benchmark:
+            self.autolog.times.end(stamp=True)
+        et = time.time()
+        return dt_boxes, et - st
+
+    def detect_batch(self, img_list):
+        """
+        批量检测，预处理后尺寸相同的图像合并为一个batch，只调用一次预测器
+        :param img_list 图像列表
+        :return (dt_boxes_list, elapse) dt_boxes_list与img_list一一对应，预处理失败的图像对应None
+        """
+        st = time.time()
+        # 只有DB后处理支持按batch拆分结果，TensorRT的动态shape也只配置了batch为1
+        if self.det_algorithm != 'DB' or self.args.use_tensorrt:
+            return [self(img)[0] for img in img_list], time.time() - st
+        dt_boxes_list = [None] * len(img_list)
+        batch_size = max(self.args.max_batch_size, 1)
+        if self.fused_preprocess is not None and all(DetPreprocessor.supports(img) for img in img_list):
+            # 按缩放后的尺寸分组，每组直接写入同一个NCHW输入缓冲区
+            groups = {}
+            for index, img in enumerate(img_list):
+                size = self.fused_preprocess.resize_shape(*img.shape[:2])
+                if size is not None:
+                    groups.setdefault(size, []).append(index)
+            for size, indexes in groups.items():
+                for beg in range(0, len(indexes), batch_size):
+                    chunk = indexes[beg:beg + batch_size]
+                    batch = self.fused_preprocess.input_buffer(len(chunk), *size)
+                    shape_list = np.stack([self.fused_preprocess.fill(img_list[index], batch[i])
+                                           for i, index in enumerate(chunk)])
+                    outputs = self._run(batch)
+                    post_result = self.postprocess_op(self._build_preds(outputs), shape_list)
+                    for index, result in zip(chunk, post_result):
+                        dt_boxes_list[index] = self._filter_boxes(result['points'], img_list[index].shape)
+            return dt_boxes_list, time.time() - st
+        groups = {}
+        for index, img in enumerate(img_list):
+            data = transform({'image': img}, self.preprocess_op)
+            if data is None or data[0] is None:
+                continue
+            norm_img, shape = data
+            groups.setdefault(norm_img.shape, []).append((index, norm_img, shape))
+        for items in groups.values():
+            for beg in range(0, len(items), batch_size):
+                chunk = items[beg:beg + batch_size]
+                batch = np.stack([item[1] for item in chunk])
+                shape_list = np.stack([item[2] for item in chunk])
+                outputs = self._run(batch)
+                post_result = self.postprocess_op(self._build_preds(outputs), shape_list)
+                for (index, _, _), result in zip(chunk, post_result):
+                    dt_boxes_list[index] = self._filter_boxes(result['points'], img_list[index].shape)
+        return dt_boxes_list, time.time() - st
+
+    def _preprocess(self, img):
+        """
+        预处理一张图像
+        :return (img输入数组 (1, C, H, W), shape_list (1, 4))，预处理失败时img为None
+        """
+        if self.fused_preprocess is not None and DetPreprocessor.supports(img):
+            return self.fused_preprocess(img)
+        data = transform({'image': img}, self.preprocess_op)
+        img, shape_list = data
+        if img is None:
+            return None, None
+        img = np.expand_dims(img, axis=0)
+        shape_list = np.expand_dims(shape_list, axis=0)
+        return img.copy(), shape_list
+
+    def _run(self, img):
         if self.use_onnx:
             input_dict = {}
             input_dict[self.input_tensor.name] = img
@@ -220,7 +301,9 @@ class TextDetector(object):
                 outputs.append(output)
             if self.args.benchmark:
                 self.autolog.times.stamp()
+        return outputs
 
+    def _build_preds(self, outputs):
         preds = {}
         if self.det_algorithm == "EAST":
             preds['f_geo'] = outputs[0]
@@ -237,22 +320,14 @@ class TextDetector(object):
                 preds['level_{}'.format(i)] = output
         else:
             raise NotImplementedError
+        return preds
 
-        #self.predictor.try_shrink_memory()
-        post_result = self.postprocess_op(preds, shape_list)
-        dt_boxes = post_result[0]['points']
+    def _filter_boxes(self, dt_boxes, image_shape):
         if (self.det_algorithm == "SAST" and self.det_sast_polygon) or (
                 self.det_algorithm in ["PSE", "FCE"] and
                 self.postprocess_op.box_type == 'poly'):
-            dt_boxes = self.filter_tag_det_res_only_clip(dt_boxes, ori_im.shape)
-        else:
-            dt_boxes = self.filter_tag_det_res(dt_boxes, ori_im.shape)
-
-        if self.args.benchmark:
-            self.autolog.times.end(stamp=True)
-        et = time.time()
-        return dt_boxes, et - st
-
+            return self.filter_tag_det_res_only_clip(dt_boxes, image_shape)
+        return self.filter_tag_det_res(dt_boxes, image_shape)
 
 if __name__ == "__main__":
     args = utility.parse_args()
@@ -109,8 +109,9 @@ class TextRecognizer(object):
         assert imgC == img.shape[2]
         imgW = int((imgH * max_wh_ratio))
         if self.use_onnx:
+            # dynamic axes are exported as None or a symbolic name
             w = self.input_tensor.shape[3:][0]
-            if w is not None and w > 0:
+            if isinstance(w, int) and w > 0:
                 imgW = w
 
         h, w = img.shape[:2]
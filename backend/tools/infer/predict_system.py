@@ -65,11 +65,19 @@ class TextSystem(object):
         self.crop_image_res_index += bbox_num
 
     def __call__(self, img, cls=True):
-        ori_im = img.copy()
         dt_boxes, elapse = self.text_detector(img)
+        return self.recognize(img, dt_boxes, cls)
 
+    def recognize(self, img, dt_boxes, cls=True):
+        """
+        使用已有的检测框(如字幕检测阶段得到的检测框)裁剪文本行并识别，不再重复检测
+        :param img 检测时使用的图像
+        :param dt_boxes 检测框，坐标需要与img一致
+        """
         if dt_boxes is None:
             return None, None
+        # get_rotate_crop_image不会修改原图，直接在img上裁剪
+        ori_im = img
         img_crop_list = []
 
         dt_boxes = sorted_boxes(dt_boxes)
@@ -87,6 +95,44 @@ class TextSystem(object):
         if self.args.save_crop_res:
             self.draw_crop_rec_res(self.args.crop_res_save_dir, img_crop_list,
                                    rec_res)
+        return self._filter_results(dt_boxes, rec_res)
+
+    def batch(self, img_list, cls=True):
+        """
+        批量识别多张图像，检测阶段合并为batch推理，
+        所有图像的文本行裁剪图汇总到同一个队列中识别，以便凑满识别batch
+        :return [(filter_boxes, filter_rec_res), ...] 与img_list一一对应
+        """
+        dt_boxes_list, elapse = self.text_detector.detect_batch(img_list)
+        # 汇总所有图像的文本行，owners记录每个裁剪图属于哪张图像的哪个检测框
+        img_crop_list, owners = [], []
+        sorted_boxes_list = []
+        for img_index, (img, dt_boxes) in enumerate(zip(img_list, dt_boxes_list)):
+            if dt_boxes is None:
+                sorted_boxes_list.append(None)
+                continue
+            dt_boxes = sorted_boxes(dt_boxes)
+            sorted_boxes_list.append(dt_boxes)
+            for bno in range(len(dt_boxes)):
+                img_crop_list.append(get_rotate_crop_image(img, copy.deepcopy(dt_boxes[bno])))
+                owners.append((img_index, bno))
+        if self.use_angle_cls and cls and len(img_crop_list) > 0:
+            img_crop_list, angle_list, elapse = self.text_classifier(
+                img_crop_list)
+        # TextRecognizer内部会按宽高比排序后再按rec_batch_num分批
+        rec_res, elapse = self.text_recognizer(img_crop_list)
+        rec_res_list = [[None] * len(dt_boxes) if dt_boxes is not None else None for dt_boxes in sorted_boxes_list]
+        for (img_index, bno), rec_result in zip(owners, rec_res):
+            rec_res_list[img_index][bno] = rec_result
+        results = []
+        for dt_boxes, frame_rec_res in zip(sorted_boxes_list, rec_res_list):
+            if dt_boxes is None:
+                results.append((None, None))
+            else:
+                results.append(self._filter_results(dt_boxes, frame_rec_res))
+        return results
+
+    def _filter_results(self, dt_boxes, rec_res):
         filter_boxes, filter_rec_res = [], []
         for box, rec_result in zip(dt_boxes, rec_res):
             text, score = rec_result
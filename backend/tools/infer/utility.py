@@ -38,6 +38,9 @@ def init_args():
     parser.add_argument("--use_tensorrt", type=str2bool, default=False)
     parser.add_argument("--min_subgraph_size", type=int, default=15)
     parser.add_argument("--precision", type=str, default="fp32")
+    # per-model precision of det/rec, falls back to precision when None
+    parser.add_argument("--det_precision", type=str, default=None)
+    parser.add_argument("--rec_precision", type=str, default=None)
     parser.add_argument("--gpu_mem", type=int, default=500)
 
     # params for text detector
@@ -46,6 +49,7 @@ def init_args():
     parser.add_argument("--det_model_dir", type=str)
     parser.add_argument("--det_limit_side_len", type=float, default=960)
     parser.add_argument("--det_limit_type", type=str, default='max')
+    parser.add_argument("--det_fused_preprocess", type=str2bool, default=True)
 
     # DB parmas
     parser.add_argument("--det_db_thresh", type=float, default=0.3)
@@ -54,6 +58,7 @@ def init_args():
     parser.add_argument("--max_batch_size", type=int, default=10)
     parser.add_argument("--use_dilation", type=str2bool, default=False)
     parser.add_argument("--det_db_score_mode", type=str, default="fast")
+    parser.add_argument("--det_db_axis_aligned", type=str2bool, default=False)
     # EAST parmas
     parser.add_argument("--det_east_score_thresh", type=float, default=0.8)
     parser.add_argument("--det_east_cover_thresh", type=float, default=0.1)
@@ -135,6 +140,10 @@ def init_args():
 
     parser.add_argument("--show_log", type=str2bool, default=False)
     parser.add_argument("--use_onnx", type=str2bool, default=False)
+    parser.add_argument("--onnx_intra_op_threads", type=int, default=0)
+    parser.add_argument("--onnx_inter_op_threads", type=int, default=1)
+    parser.add_argument(
+        "--onnx_graph_optimization_level", type=str, default="all")
     return parser
 
 
@@ -164,7 +173,24 @@ def create_predictor(args, mode, logger):
         if not os.path.exists(model_file_path):
             raise ValueError("not find model file path {}".format(
                 model_file_path))
-        sess = ort.InferenceSession(model_file_path)
+        sess_options = ort.SessionOptions()
+        # intra-op threads default to cpu_threads, the same budget as paddle
+        intra_op_threads = getattr(args, 'onnx_intra_op_threads', 0)
+        sess_options.intra_op_num_threads = intra_op_threads if intra_op_threads > 0 else args.cpu_threads
+        sess_options.inter_op_num_threads = max(getattr(args, 'onnx_inter_op_threads', 1), 1)
+        if sess_options.inter_op_num_threads > 1:
+            sess_options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        sess_options.graph_optimization_level = {
+            'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[getattr(args, 'onnx_graph_optimization_level', 'all')]
+        providers = ['CPUExecutionProvider']
+        if args.use_gpu and 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        sess = ort.InferenceSession(
+            model_file_path, sess_options=sess_options, providers=providers)
         return sess, sess.get_inputs()[0], None, None
 
     else:
@@ -179,10 +205,12 @@ def create_predictor(args, mode, logger):
 
         config = inference.Config(model_file_path, params_file_path)
 
-        if hasattr(args, 'precision'):
-            if args.precision == "fp16" and args.use_tensorrt:
+        # det/rec may use different precisions, e.g. only one of them has an int8 model
+        model_precision = getattr(args, '{}_precision'.format(mode), None) or getattr(args, 'precision', None)
+        if model_precision is not None:
+            if model_precision == "fp16" and args.use_tensorrt:
                 precision = inference.PrecisionType.Half
-            elif args.precision == "int8":
+            elif model_precision == "int8":
                 precision = inference.PrecisionType.Int8
             else:
                 precision = inference.PrecisionType.Float32
@@ -296,8 +324,11 @@ def create_predictor(args, mode, logger):
                 # cache 10 different shapes for mkldnn to avoid memory leak
                 config.set_mkldnn_cache_capacity(10)
                 config.enable_mkldnn()
-                if args.precision == "fp16":
+                if model_precision == "fp16":
                     config.enable_mkldnn_bfloat16()
+                elif model_precision == "int8" and hasattr(config, 'enable_mkldnn_int8'):
+                    # run the fake-quant ops of a post-training quantised model as int8 kernels
+                    config.enable_mkldnn_int8()
         # enable memory optim
         config.enable_memory_optim()
         config.disable_glog_info()
@@ -6,10 +6,12 @@ import importlib
 
 # 加载文本检测+识别模型
 class OcrRecogniser:
-    def __init__(self):
+    def __init__(self, cpu_threads=None):
         # 获取参数对象
         importlib.reload(config)
         self.args = utility.parse_args()
+        # CPU推理线程数，为None时使用配置文件中的值
+        self.cpu_threads = cpu_threads
         self.recogniser = self.init_model()
 
     @staticmethod
@@ -23,7 +25,30 @@ class OcrRecogniser:
 
     def predict(self, image):
         detection_box, recognise_result = self.recogniser(image)
-        if len(detection_box) > 0:
+        return self._rank(detection_box, recognise_result)
+
+    def predict_with_boxes(self, image, dt_boxes):
+        """
+        使用已有的检测框识别图像，跳过文本检测
+        :param image 检测时使用的图像
+        :param dt_boxes 检测框，坐标需要与image一致
+        """
+        detection_box, recognise_result = self.recogniser.recognize(image, dt_boxes)
+        return self._rank(detection_box, recognise_result)
+
+    def predict_batch(self, images):
+        """
+        批量识别多张图像
+        :return [(dt_box, rec_res), ...] 与images一一对应
+        """
+        return [self._rank(detection_box, recognise_result)
+                for detection_box, recognise_result in self.recogniser.batch(images)]
+
+    def _rank(self, detection_box, recognise_result):
+        """
+        将识别结果按行、从左到右排序
+        """
+        if detection_box is not None and len(detection_box) > 0:
             coordinate_list = list()
             if isinstance(detection_box, list):
                 for i in detection_box:
@@ -85,10 +110,16 @@ class OcrRecogniser:
 
     def init_model(self):
         self.args.use_gpu = config.USE_GPU
+        self.args.cpu_threads = self.cpu_threads if self.cpu_threads else config.CPU_THREADS
+        self.args.enable_mkldnn = config.ENABLE_MKLDNN and not config.USE_GPU
+        self.args.det_precision = config.DET_INFERENCE_PRECISION
+        self.args.rec_precision = config.REC_INFERENCE_PRECISION
         # 设置文本检测模型路径
         self.args.det_model_dir = config.DET_MODEL_PATH
+        self.args.det_db_axis_aligned = config.DET_AXIS_ALIGNED_BOX
         # 设置文本识别模型路径
         self.args.rec_model_dir = config.REC_MODEL_PATH
+        set_inference_backend(self.args)
         self.args.rec_char_dict_path = config.DICT_PATH
         self.args.rec_image_shape = config.REC_IMAGE_SHAPE
         # 设置识别文本的类型
@@ -99,6 +130,22 @@ class OcrRecogniser:
         return TextSystem(self.args)
 
 
+def set_inference_backend(args):
+    """
+    根据配置选择推理后端，使用ONNX Runtime时模型路径替换为ONNX文件路径
+    """
+    args.use_onnx = config.USE_ONNX
+    if config.USE_ONNX:
+        args.det_model_dir = config.DET_ONNX_MODEL_PATH
+        args.rec_model_dir = config.REC_ONNX_MODEL_PATH
+        args.onnx_intra_op_threads = config.ONNX_INTRA_OP_THREADS
+        args.onnx_inter_op_threads = config.ONNX_INTER_OP_THREADS
+        args.onnx_graph_optimization_level = config.ONNX_GRAPH_OPTIMIZATION_LEVEL
+        # ONNX Runtime不使用Paddle的MKLDNN与TensorRT配置
+        args.enable_mkldnn = False
+        args.use_tensorrt = False
+
+
 def get_coordinates(dt_box):
     """
     从返回的检测框中获取坐标
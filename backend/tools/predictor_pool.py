@@ -0,0 +1,97 @@
+"""
+进程级别的模型池
+每个进程内按(检测模型路径, 识别模型路径, 识别语言, 识别模式)缓存已经初始化好的预测器，
+避免在逐帧处理的循环里重复创建Paddle预测器
+"""
+import threading
+import numpy as np
+import config
+from tools.ocr import OcrRecogniser
+
+
+class PredictorPool:
+    """
+    惰性初始化的预测器池，同一进程内相同key的预测器只会创建一次
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._predictors = {}
+        # 已预热的key
+        self._warmed = set()
+        # 命中与未命中次数，用于确认热循环中没有重复初始化
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, factory):
+        """
+        获取key对应的预测器，不存在时调用factory创建
+        :param key 预测器的唯一标识
+        :param factory 无参数的构造函数
+        """
+        with self._lock:
+            predictor = self._predictors.get(key)
+            if predictor is not None:
+                self.hits += 1
+                return predictor
+            self.misses += 1
+            predictor = factory()
+            self._predictors[key] = predictor
+            return predictor
+
+    def warmup(self, key, predictor, warmup_fn):
+        """
+        对预测器进行预热，每个key只预热一次
+        """
+        with self._lock:
+            if key in self._warmed:
+                return
+            self._warmed.add(key)
+        warmup_fn(predictor)
+
+    def clear(self):
+        with self._lock:
+            self._predictors.clear()
+            self._warmed.clear()
+
+    def stats(self):
+        """
+        返回模型池的统计信息
+        """
+        with self._lock:
+            return {'size': len(self._predictors), 'hits': self.hits, 'misses': self.misses,
+                    'warmed': len(self._warmed)}
+
+
+# 每个进程独立的模型池
+predictor_pool = PredictorPool()
+
+
+def ocr_model_key(cpu_threads=None, owner=None):
+    """
+    根据当前配置生成OCR模型的key
+    """
+    return 'ocr', config.DET_MODEL_PATH, config.REC_MODEL_PATH, config.REC_CHAR_TYPE, config.MODE_TYPE, \
+        config.USE_ONNX, cpu_threads, owner
+
+
+def get_ocr_recogniser(warmup=False, cpu_threads=None, owner=None):
+    """
+    获取当前进程中缓存的文本检测+识别模型
+    :param warmup 首次获取时是否使用随机图像预热模型
+    :param cpu_threads CPU推理线程数，为None时使用配置文件中的值
+    :param owner 使用者标识，Paddle预测器与检测预处理缓冲区都不是线程安全的，
+                 同一进程中会在不同线程里并发调用的使用者需要传入不同的owner，各自持有一份模型
+    """
+    key = ocr_model_key(cpu_threads, owner)
+    recogniser = predictor_pool.get(key, lambda: OcrRecogniser(cpu_threads))
+    if warmup:
+        predictor_pool.warmup(key, recogniser, _warmup_ocr)
+    return recogniser
+
+
+def _warmup_ocr(recogniser):
+    # 与predict_system中的预热方式保持一致
+    img = np.random.uniform(0, 255, [640, 640, 3]).astype(np.uint8)
+    for _ in range(2):
+        recogniser.predict(img)
@@ -0,0 +1,142 @@
+"""
+原始字幕记录存储
+OCR识别出的每一行文本按列保存(帧号, 坐标, 文本, 置信度)，后处理直接在数组上进行，不再反复读写并解析raw.txt；
+同时以追加方式写入二进制文件，OCR进程与主进程之间通过该文件传递结果，进程意外退出时已写入的记录也不会丢失
+"""
+import struct
+import numpy as np
+
+# 二进制记录头: frame_no帧号, xmin, xmax, ymin, ymax, score置信度, 文本的utf-8字节数，之后紧跟文本
+RECORD_HEADER = struct.Struct('<iiiiifI')
+
+
+class RawSubtitleStore:
+    def __init__(self, spill_path=None, journal=None, keep_in_memory=True):
+        """
+        :param spill_path 追加写入的二进制文件路径，为None时只保存在内存中
+        :param journal 检查点日志SegmentJournal，追加的记录同时写入其中
+        :param keep_in_memory 追加的记录是否同时保存在内存中，只写入文件(OCR进程)时为False，不会随视频长度占用内存
+        """
+        self.spill_path = spill_path
+        self.journal = journal
+        self.keep_in_memory = keep_in_memory or spill_path is None
+        self._spill = open(spill_path, mode='wb') if spill_path is not None else None
+        self.frame_no = np.zeros(0, dtype=np.int64)
+        # 坐标 (xmin, xmax, ymin, ymax)
+        self.box = np.zeros((0, 4), dtype=np.int64)
+        self.text = np.zeros(0, dtype=object)
+        self.score = np.zeros(0, dtype=np.float32)
+        # 尚未合并到数组中的记录
+        self._pending = []
+
+    def append(self, frame_no, box, text, score=1.0):
+        """
+        追加一条记录
+        :param frame_no 帧号
+        :param box 坐标 (xmin, xmax, ymin, ymax)
+        :param text 文本
+        :param score 识别置信度
+        """
+        record = (int(frame_no), tuple(int(i) for i in box), text, float(score))
+        if self.keep_in_memory:
+            self._pending.append(record)
+        if self.journal is not None:
+            self.journal.append(*record)
+        if self._spill is not None:
+            data = text.encode('utf-8')
+            self._spill.write(RECORD_HEADER.pack(record[0], *record[1], record[3], len(data)))
+            self._spill.write(data)
+
+    def flush(self):
+        """
+        将已追加的记录写入磁盘，每处理完一帧调用一次
+        """
+        if self._spill is not None:
+            self._spill.flush()
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def __len__(self):
+        self._compact()
+        return len(self.frame_no)
+
+    def columns(self):
+        """
+        :return (frame_no, box, text, score)
+        """
+        self._compact()
+        return self.frame_no, self.box, self.text, self.score
+
+    def select(self, index):
+        """
+        只保留index(布尔掩码或下标数组)选中的记录，保持原有顺序
+        """
+        self._compact()
+        self.frame_no = self.frame_no[index]
+        self.box = self.box[index]
+        self.text = self.text[index]
+        self.score = self.score[index]
+
+    def sort(self):
+        """
+        按帧号稳定排序，同一帧内保持原有顺序
+        """
+        self._compact()
+        self.select(np.argsort(self.frame_no, kind='stable'))
+
+    def extend(self, other):
+        """
+        追加另一个存储中的全部记录(仅内存)
+        """
+        self._compact()
+        frame_no, box, text, score = other.columns()
+        self.frame_no = np.concatenate([self.frame_no, frame_no])
+        self.box = np.concatenate([self.box, box])
+        self.text = np.concatenate([self.text, text])
+        self.score = np.concatenate([self.score, score])
+
+    def save(self, path):
+        """
+        将全部记录写入一个新的二进制文件
+        """
+        self._compact()
+        with open(path, mode='wb') as f:
+            for frame_no, box, text, score in zip(self.frame_no.tolist(), self.box.tolist(), self.text.tolist(),
+                                                  self.score.tolist()):
+                data = text.encode('utf-8')
+                f.write(RECORD_HEADER.pack(frame_no, *box, score, len(data)))
+                f.write(data)
+
+    @classmethod
+    def load(cls, path):
+        """
+        读取二进制文件，末尾不完整的记录(写入时进程退出)会被忽略
+        """
+        store = cls()
+        with open(path, mode='rb') as f:
+            buffer = f.read()
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(buffer):
+            frame_no, xmin, xmax, ymin, ymax, score, size = RECORD_HEADER.unpack_from(buffer, offset)
+            offset += RECORD_HEADER.size
+            if offset + size > len(buffer):
+                break
+            text = buffer[offset:offset + size].decode('utf-8')
+            offset += size
+            store._pending.append((frame_no, (xmin, xmax, ymin, ymax), text, score))
+        return store
+
+    def _compact(self):
+        if len(self._pending) == 0:
+            return
+        frame_no, box, text, score = zip(*self._pending)
+        text_array = np.empty(len(text), dtype=object)
+        text_array[:] = text
+        self.frame_no = np.concatenate([self.frame_no, np.array(frame_no, dtype=np.int64)])
+        self.box = np.concatenate([self.box, np.array(box, dtype=np.int64).reshape(-1, 4)])
+        self.text = np.concatenate([self.text, text_array])
+        self.score = np.concatenate([self.score, np.array(score, dtype=np.float32)])
+        self._pending.clear()
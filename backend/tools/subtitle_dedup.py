@@ -0,0 +1,72 @@
+"""
+字幕去重与合并
+按帧号顺序逐条消费OCR记录：同一帧的多行文本先合并为一行，再与当前未结束的字幕段比较，
+文本不相似时当前字幕段结束并立即输出 (start开始帧号, end结束帧号, text文本)，整个过程只需遍历一遍
+"""
+import unicodedata
+from Levenshtein import ratio
+
+
+class SubtitleDeduplicator:
+    def __init__(self, threshold, extend_single_frame=True):
+        """
+        :param threshold 文本相似度阈值，与字幕段第一帧文本的相似度不低于该值时视为同一条字幕
+        :param extend_single_frame 字幕段只有一帧时，是否以下一条字幕的开始帧作为结束帧
+        """
+        self.threshold = threshold
+        self.extend_single_frame = extend_single_frame
+        # 当前帧号与当前帧已读取的文本
+        self._frame_no = None
+        self._frame_texts = []
+        # 未结束的字幕段: [start开始帧号, end结束帧号, key第一帧去空格后的文本, text最长文本, length最长文本的长度]
+        self._span = None
+
+    def push(self, frame_no, text):
+        """
+        输入一条OCR记录，记录需要按帧号顺序输入
+        :return 因此结束的字幕段列表
+        """
+        if frame_no == self._frame_no:
+            self._frame_texts.append(text)
+            return []
+        spans = self._push_frame()
+        self._frame_no = frame_no
+        self._frame_texts = [text]
+        return spans
+
+    def finish(self):
+        """
+        所有记录输入完成，输出剩余的字幕段
+        """
+        spans = self._push_frame()
+        self._frame_no = None
+        self._frame_texts = []
+        if self._span is not None:
+            start, end, _, text, _ = self._span
+            spans.append((start, end, text))
+            self._span = None
+        return spans
+
+    def _push_frame(self):
+        if self._frame_no is None:
+            return []
+        # 同一帧的多行字幕合并为一行
+        text = unicodedata.normalize('NFKC', ' '.join(self._frame_texts))
+        # 每条文本只去一次空格
+        key = text.replace(' ', '')
+        span = self._span
+        if span is not None and ratio(span[2], key) >= self.threshold:
+            span[1] = self._frame_no
+            # 保留最长的字幕(长度相同时保留先出现的)
+            if len(key) > span[4]:
+                span[3], span[4] = text, len(key)
+            return []
+        spans = []
+        if span is not None:
+            start, end, _, span_text, _ = span
+            # 针对只有一帧的情况，以下一帧的开始时间为准
+            if self.extend_single_frame and end == start:
+                end = self._frame_no
+            spans.append((start, end, span_text))
+        self._span = [self._frame_no, self._frame_no, key, text, len(key)]
+        return spans
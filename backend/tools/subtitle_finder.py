@@ -0,0 +1,128 @@
+"""
+字幕帧查找
+在当前进程中代替VideoSubFinder：视频帧的字幕区域按batch堆叠为数组，一次性计算每帧的水平边缘图(文字笔画的轮廓)，
+边缘图与当前字幕段参考帧相比变化超过阈值的帧作为新字幕段的开始，边缘密度用于判断该字幕段是否可能包含文字。
+只比较边缘图而不比较灰度，字幕后方画面的亮度变化不会开始新的字幕段；
+每个字幕段至少持续min_segment_frames帧，画面持续变化时OCR次数也不会超过每min_segment_frames帧一次
+"""
+import numpy as np
+from tools.change_detector import SubtitleChangeDetector
+
+
+class SubtitleFrameFinder:
+    def __init__(self, change_detector=None, edge_threshold=40, min_edge_density=0.005, change_threshold=0.05,
+                 change_ratio=0.5, block_width=16, min_segment_frames=1, batch_size=16):
+        """
+        :param change_detector 用于计算字幕区域签名(降采样灰度图)的SubtitleChangeDetector
+        :param edge_threshold 相邻像素灰度差超过该值视为文字边缘
+        :param min_edge_density 边缘像素占比不低于该值时认为字幕区域包含文字
+        :param change_threshold 边缘图按列分块比较，某一块中变化像素的占比超过该值，
+                                且变化像素在该块两帧边缘像素并集中的占比超过change_ratio时开始新的字幕段
+        :param change_ratio 文字更换时该块中两帧的笔画几乎不重叠，该占比接近1；
+                            同一条字幕只有部分边缘随背景亮度闪烁，且分散在整行文字中，每一块的占比都较低
+        :param block_width 分块的宽度(签名中的像素数)，约为一到两个字的宽度，只改动一个字的字幕也能被发现
+        :param min_segment_frames 字幕段的最少帧数，当前字幕段开始后的这些帧不会开始新的字幕段
+        :param batch_size 每次堆叠计算的帧数
+        """
+        self.change_detector = change_detector or SubtitleChangeDetector()
+        self.edge_threshold = edge_threshold
+        self.min_edge_density = min_edge_density
+        self.change_threshold = change_threshold
+        self.change_ratio = change_ratio
+        self.block_width = max(int(block_width), 1)
+        self.min_segment_frames = max(int(min_segment_frames), 1)
+        self.batch_size = max(int(batch_size), 1)
+        # 当前字幕段参考帧的边缘图与帧号
+        self._reference = None
+        self._reference_frame_no = None
+        # 等待计算的帧，元素为 (frame_no, region, origin, signature)
+        self._batch = []
+        # 统计信息
+        self.frames = 0
+        self.changes = 0
+        self.with_text = 0
+
+    def push(self, frame_no, region, origin=(0, 0)):
+        """
+        输入一帧的字幕区域，帧号需要递增
+        :return 字幕区域发生变化的帧列表，元素为 (frame_no, region, origin, has_text)
+        """
+        self.frames += 1
+        self._batch.append((frame_no, region.copy(), origin, self.change_detector.signature(region)))
+        if len(self._batch) < self.batch_size:
+            return []
+        return self._flush()
+
+    def finish(self):
+        """
+        所有视频帧输入完成，计算剩余的帧
+        """
+        return self._flush()
+
+    def stats(self):
+        return {'frames': self.frames, 'changes': self.changes, 'with_text': self.with_text}
+
+    def _flush(self):
+        if len(self._batch) == 0:
+            return []
+        signatures = np.stack([item[3] for item in self._batch]).astype(np.int16)
+        # 每帧的水平边缘图与边缘密度
+        edges = np.abs(np.diff(signatures, axis=2)) > self.edge_threshold
+        edge_density = edges.mean(axis=(1, 2))
+        frame_nos = np.array([item[0] for item in self._batch])
+        changes = []
+        start = 0
+        while start < len(edges):
+            if self._reference is None:
+                index = start
+            else:
+                # 当前字幕段持续min_segment_frames帧之后才比较
+                start = max(start, int(np.searchsorted(frame_nos, self._reference_frame_no + self.min_segment_frames)))
+                if start >= len(edges):
+                    break
+                # 按列分块统计剩余帧与参考帧边缘图中的变化像素数，以及两者边缘像素并集的像素数
+                n, h, w = edges[start:].shape
+                block = max(min(self.block_width, w), 1)
+                width = w // block * block
+                current, reference = edges[start:, :, :width], self._reference[:, :width]
+                changed = (current != reference).reshape(n, h, -1, block).sum(axis=(1, 3))
+                union = (current | reference).reshape(n, h, -1, block).sum(axis=(1, 3))
+                # 任意一块中变化像素足够多，且大部分边缘都发生了变化，说明这一块的文字被替换
+                over = (changed > self.change_threshold * h * block) & (changed > self.change_ratio * union)
+                over = np.flatnonzero(over.any(axis=1))
+                if len(over) == 0:
+                    break
+                index = start + int(over[0])
+            self._reference = edges[index]
+            frame_no, region, origin, _ = self._batch[index]
+            self._reference_frame_no = frame_no
+            has_text = bool(edge_density[index] >= self.min_edge_density)
+            changes.append((frame_no, region, origin, has_text))
+            self.changes += 1
+            self.with_text += has_text
+            start = index + 1
+        self._batch = []
+        return changes
+
+
+if __name__ == '__main__':
+    # 统计一个视频在指定字幕区域内的OCR次数，与按固定频率抽帧对比
+    # 用法(在backend目录下): python -m tools.subtitle_finder <视频路径> ymin ymax xmin xmax [每秒抽帧数]
+    import sys
+    import cv2
+    video_path, (ymin, ymax, xmin, xmax) = sys.argv[1], map(int, sys.argv[2:6])
+    extract_frequency = float(sys.argv[6]) if len(sys.argv) > 6 else 3
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    finder = SubtitleFrameFinder(min_segment_frames=max(int(fps * 0.5), 1))
+    frame_no, ocr_calls = 0, 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame_no += 1
+        ocr_calls += sum(has_text for _, _, _, has_text in finder.push(frame_no, frame[ymin:ymax, xmin:xmax]))
+    ocr_calls += sum(has_text for _, _, _, has_text in finder.finish())
+    cap.release()
+    print(f'{frame_no} frames, finder: {ocr_calls} OCR calls {finder.stats()}, '
+          f'sampling at {extract_frequency} fps: {int(frame_no / fps * extract_frequency)} OCR calls')
@@ -4,7 +4,11 @@ from multiprocessing import Queue, Process
 import cv2
 from PIL import ImageFont, ImageDraw, Image
 from tqdm import tqdm
-from tools.ocr import OcrRecogniser, get_coordinates
+from tools.ocr import get_coordinates
+from tools.predictor_pool import predictor_pool, get_ocr_recogniser
+from tools.frame_source import SequentialFrameSource
+from tools.raw_store import RawSubtitleStore
+from tools.checkpoint import SegmentJournal
 from tools.constant import SubtitleArea
 from tools import constant
 from threading import Thread
@@ -16,21 +20,31 @@ import numpy as np
 from collections import namedtuple
 
 
-def extract_subtitles(data, text_recogniser, img, raw_subtitle_file,
-                      sub_area, options, dt_box_arg, rec_res_arg, ocr_loss_debug_path):
+# OCR任务格式
+# total_frame_count总帧数, current_frame_no当前帧, dt_box检测框, rec_res识别结果, total_ms当前帧时间, subtitle_area字幕区域,
+# frame_ref共享内存中的视频帧引用(为None时由OCR进程自行解码), same_as_previous字幕区域与上一帧相同，复用上一帧的识别结果
+# 只有dt_box没有rec_res时，直接使用dt_box(原视频帧坐标)裁剪识别，不再检测
+OcrTask = namedtuple('OcrTask', 'total_frame_count current_frame_no dt_box rec_res total_ms subtitle_area frame_ref '
+                                'same_as_previous', defaults=(None, False))
+
+
+def extract_subtitles(data, img, raw_store,
+                      sub_area, options, dt_box_arg, rec_res_arg, ocr_loss_debug_path, origin=(0, 0)):
     """
-    提取视频帧中的字幕信息
+    提取视频帧中的字幕信息，检测与识别都已由生产者完成，这里不再调用模型
+    :param raw_store 原始字幕记录存储RawSubtitleStore
+    :param origin img左上角在原视频帧中的坐标(y, x)，img为裁剪后的区域时使用
     """
     # 从参数中获取检测框与检测结果
     dt_box = dt_box_arg
+    # rec_res格式为： ("hello", 0.997)
     rec_res = rec_res_arg
-    # 如果没有检测结果，则获取检测结果
+    # 没有检测结果时视为没有文本
     if dt_box is None or rec_res is None:
-        dt_box, rec_res = text_recogniser.predict(img)
-        # rec_res格式为： ("hello", 0.997)
+        dt_box, rec_res = [], []
     # 获取文本坐标
     coordinates = get_coordinates(dt_box)
-    # 将结果写入txt文本中
+    # 将结果写入原始字幕记录中
     if options.REC_CHAR_TYPE == 'en':
         # 如果识别语言为英文，则去除中文
         text_res = [(re.sub('[\u4e00-\u9fa5]', '', res[0]), res[1]) for res in rec_res]
@@ -60,26 +74,32 @@ def extract_subtitles(data, text_recogniser, img, raw_subtitle_file,
                     # 保留该帧
                     selected = True
                     line += f'{str(data["i"]).zfill(8)}\t{coordinate}\t{text}\n'
-                    raw_subtitle_file.write(f'{str(data["i"]).zfill(8)}\t{coordinate}\t{text}\n')
+                    raw_store.append(data['i'], coordinate, text, prob)
             # 保存丢掉的识别结果
             loss_info = namedtuple('loss_info', 'text prob overflow_area_rate coordinate selected')
             loss_list.append(loss_info(text, prob, overflow_area_rate, coordinate, selected))
         else:
-            raw_subtitle_file.write(f'{str(data["i"]).zfill(8)}\t{coordinate}\t{text}\n')
+            raw_store.append(data['i'], coordinate, text, prob)
+    raw_store.flush()
     # 输出调试信息
-    dump_debug_info(options, line, img, loss_list, ocr_loss_debug_path, sub_area, data)
+    dump_debug_info(options, line, img, loss_list, ocr_loss_debug_path, sub_area, data, origin)
 
 
-def dump_debug_info(options, line, img, loss_list, ocr_loss_debug_path, sub_area, data):
+def dump_debug_info(options, line, img, loss_list, ocr_loss_debug_path, sub_area, data, origin=(0, 0)):
     loss = False
     if options.DEBUG_OCR_LOSS and options.REC_CHAR_TYPE in ('ch', 'japan ', 'korea', 'ch_tra'):
         loss = len(line) > 0 and re.search(r'[\u4e00-\u9fa5\u3400-\u4db5\u3130-\u318F\uAC00-\uD7A3\u0800-\u4e00]', line) is None
     if loss:
         if not os.path.exists(ocr_loss_debug_path):
             os.makedirs(ocr_loss_debug_path, mode=0o777, exist_ok=True)
-        img = cv2.rectangle(img, (sub_area[2], sub_area[0]), (sub_area[3], sub_area[1]), constant.BGR_COLOR_BLUE, 2)
+        # 调试图像可能是共享内存上的视图或裁剪区域，复制一份再绘制，并将坐标换算到图像内
+        img = img.copy()
+        oy, ox = origin
+        img = cv2.rectangle(img, (sub_area[2] - ox, sub_area[0] - oy), (sub_area[3] - ox, sub_area[1] - oy),
+                            constant.BGR_COLOR_BLUE, 2)
         for loss_info in loss_list:
-            coordinate = loss_info.coordinate
+            xmin, xmax, ymin, ymax = loss_info.coordinate
+            coordinate = (xmin - ox, xmax - ox, ymin - oy, ymax - oy)
             color = constant.BGR_COLOR_GREEN if loss_info.selected else constant.BGR_COLOR_RED
             text = f"[{loss_info.text}] prob:{loss_info.prob:.4f} or:{loss_info.overflow_area_rate:.2f}"
             img = paint_chinese_opencv(img, text, pos=(coordinate[0], coordinate[2] - 30), color=color)
@@ -117,95 +137,176 @@ def paint_chinese_opencv(im, chinese, pos, color):
     return img
 
 
-def ocr_task_consumer(ocr_queue, raw_subtitle_path, sub_area, video_path, options):
+def ocr_task_consumer(ocr_queue, raw_subtitle_path, sub_area, video_path, options, frame_ring=None):
     """
-    消费者： 消费ocr_queue，将ocr队列中的数据取出，进行ocr识别，写入字幕文件中
-    :param ocr_queue (current_frame_no当前帧帧号, frame 视频帧, dt_box检测框, rec_res识别结果)
+    消费者： 消费ocr_queue，将ocr队列中生产者已识别完成的结果取出，写入字幕文件中，不持有模型
+    :param ocr_queue (current_frame_no当前帧帧号, frame 视频帧, dt_box检测框, rec_res识别结果, frame_ref共享内存帧引用, origin裁剪原点)
     :param raw_subtitle_path
     :param sub_area
     :param video_path
     :param options
+    :param frame_ring 共享内存帧环，处理完成后归还frame_ref对应的槽位
     """
     data = {'i': 1}
-    # 初始化文本识别对象
-    text_recogniser = OcrRecogniser()
     # 丢失字幕的存储路径
     ocr_loss_debug_path = os.path.join(os.path.abspath(os.path.splitext(video_path)[0]), 'loss')
     # 删除之前的缓存垃圾
     if os.path.exists(ocr_loss_debug_path):
         shutil.rmtree(ocr_loss_debug_path, True)
 
-    with open(raw_subtitle_path, mode='w+', encoding='utf-8') as raw_subtitle_file:
-        while True:
-            try:
-                frame_no, frame, dt_box, rec_res = ocr_queue.get(block=True)
-                if frame_no == -1:
-                    return
-                data['i'] = frame_no
-                extract_subtitles(data, text_recogniser, frame, raw_subtitle_file, sub_area, options, dt_box,
-                                  rec_res, ocr_loss_debug_path)
-            except Exception as e:
-                print(e)
+    # 每隔checkpoint_interval帧将识别结果提交到检查点日志，进程退出后可以从最后提交的帧继续
+    checkpoint_interval = getattr(options, 'CHECKPOINT_INTERVAL', 0)
+    journal = SegmentJournal(f'{raw_subtitle_path}.journal', getattr(options, 'RESUME_FRAME_NO', 0)) \
+        if checkpoint_interval > 0 else None
+    # 识别结果追加写入原始字幕文件，由主进程读取，当前进程不保留在内存中
+    raw_store = RawSubtitleStore(raw_subtitle_path, journal, keep_in_memory=False)
+    # 最后一个识别完成的帧号
+    last_frame_no = None
+    while True:
+        try:
+            frame_no, frame, dt_box, rec_res, frame_ref, origin = ocr_queue.get(block=True)
+            if frame_no == -1:
+                # 所有任务都已识别完成
+                if journal is not None and last_frame_no is not None:
+                    journal.commit(last_frame_no)
                 break
+            # 任务按帧号顺序到达，当前帧之前的帧都已经识别完成
+            if journal is not None and frame_no - 1 - journal.committed_frame_no >= checkpoint_interval:
+                journal.commit(frame_no - 1)
+            data['i'] = frame_no
+            last_frame_no = frame_no
+            extract_subtitles(data, frame, raw_store, sub_area, options, dt_box,
+                              rec_res, ocr_loss_debug_path, origin)
+            if frame_ref is not None:
+                frame_ring.release(frame_ref)
+        except Exception as e:
+            print(e)
+            break
+    raw_store.close()
+    if journal is not None:
+        journal.close()
 
 
-def ocr_task_producer(ocr_queue, task_queue, progress_queue, video_path, raw_subtitle_path):
+def ocr_task_producer(ocr_queue, task_queue, progress_queue, video_path, raw_subtitle_path, sub_area, options,
+                      frame_ring=None):
     """
     生产者：负责生产用于OCR识别的数据，将需要进行ocr识别的数据加入ocr_queue中
-    :param ocr_queue (current_frame_no当前帧帧号, frame 视频帧, dt_box检测框, rec_res识别结果)
-    :param task_queue (total_frame_count总帧数, current_frame_no当前帧帧号, dt_box检测框, rec_res识别结果, subtitle_area字幕区域)
-    :param progress_queue
+    :param ocr_queue (current_frame_no当前帧帧号, frame 视频帧, dt_box检测框, rec_res识别结果, frame_ref共享内存帧引用, origin裁剪原点)
+    :param task_queue OcrTask
+    :param progress_queue 为None时不汇报进度(多进程模式下由调度线程汇报)
     :param video_path
     :param raw_subtitle_path
+    :param sub_area 字幕区域，开启SUB_AREA_ROI时只在该区域内检测与识别
+    :param options
+    :param frame_ring 共享内存帧环，任务携带frame_ref时直接从中读取视频帧
     """
-    cap = cv2.VideoCapture(video_path)
+    roi_sub_area = sub_area if getattr(options, 'SUB_AREA_ROI', False) else None
+    roi_margin = getattr(options, 'SUB_AREA_ROI_MARGIN', 0)
+    # 攒够batch_size帧或者等待超过batch_timeout秒后，批量进行一次识别
+    batch_size = max(getattr(options, 'OCR_BATCH_SIZE', 1), 1)
+    batch_timeout = getattr(options, 'OCR_BATCH_TIMEOUT', 0.1)
+    # 顺序解码的视频帧源，避免每个任务都seek
+    frame_source = SequentialFrameSource(video_path)
+    # 从模型池中获取文本识别对象，整个进程只初始化一次
+    ocr = get_ocr_recogniser(warmup=True, cpu_threads=getattr(options, 'CPU_THREADS', None))
     tbar = None
+    # 上一次识别的结果 (frame, dt_box, rec_res, origin)
+    last_result = None
+    # 等待识别的帧，元素为 [current_frame_no, frame, dt_box, rec_res, frame_ref, origin, same_as_previous]
+    pending = []
+
+    def flush():
+        """
+        批量识别pending中的帧，并按原顺序放入ocr识别队列
+        """
+        nonlocal last_result
+        to_predict = [item for item in pending if not item[6] and item[2] is None]
+        if len(to_predict) > 0:
+            for item, (dt_box, rec_res) in zip(to_predict, ocr.predict_batch([item[1] for item in to_predict])):
+                # 预处理失败的帧没有结果，按没有文本处理，消费者线程不会再调用模型
+                if dt_box is None or rec_res is None:
+                    dt_box, rec_res = [], []
+                # 识别结果需要换算回原视频帧坐标
+                item[2], item[3] = translate_boxes(dt_box, item[5]), rec_res
+        # 主进程已经检测过的帧只需要识别
+        for item in pending:
+            if not item[6] and item[2] is not None and item[3] is None:
+                oy, ox = item[5]
+                dt_box = np.array(translate_boxes(item[2], (-oy, -ox)), dtype=np.float32).reshape(-1, 4, 2)
+                dt_box, rec_res = ocr.predict_with_boxes(item[1], dt_box)
+                item[2], item[3] = translate_boxes(dt_box, item[5]), rec_res
+        for current_frame_no, frame, dt_box, rec_res, frame_ref, origin, same_as_previous in pending:
+            # 字幕区域与上一帧相同，直接复用上一帧的结果
+            if same_as_previous:
+                frame, dt_box, rec_res, origin = last_result
+            else:
+                # frame仅用于调试输出，共享内存槽位归还后可能被覆盖
+                last_result = (frame, dt_box, rec_res, origin)
+            ocr_queue.put((current_frame_no, frame, dt_box, rec_res, frame_ref, origin))
+        pending.clear()
+
     while True:
         try:
-            # 从任务队列中提取任务信息
-            total_frame_count, current_frame_no, dt_box, rec_res, total_ms, default_subtitle_area = task_queue.get(block=True)
-            progress_queue.put(current_frame_no)
+            # 从任务队列中提取任务信息，有待识别的帧时最多等待batch_timeout秒
+            try:
+                task = OcrTask(*task_queue.get(block=True, timeout=batch_timeout if pending else None))
+            except queue.Empty:
+                flush()
+                continue
+            total_frame_count, current_frame_no, dt_box, rec_res, total_ms, default_subtitle_area = task[:6]
+            if progress_queue is not None:
+                progress_queue.put(current_frame_no)
             if tbar is None:
                 tbar = tqdm(total=round(total_frame_count), position=1)
             # current_frame 等于-1说明所有视频帧已经读完
             if current_frame_no == -1:
+                flush()
                 # ocr识别队列加入结束标志
-                ocr_queue.put((-1, None, None, None))
+                ocr_queue.put((-1, None, None, None, None, None))
                 # 更新进度条
                 tbar.update(tbar.total - tbar.n)
                 break
             tbar.update(round(current_frame_no - tbar.n))
-            # 设置当前视频帧
-            # 如果total_ms不为空，则使用了VSF提取字幕
-            if total_ms is not None:
-                cap.set(cv2.CAP_PROP_POS_MSEC, total_ms)
+            # 字幕区域与上一帧相同，不再解码与识别
+            if task.same_as_previous and (last_result is not None or len(pending) > 0):
+                pending.append([current_frame_no, None, None, None, None, None, True])
             else:
-                cap.set(cv2.CAP_PROP_POS_FRAMES, current_frame_no - 1)
-            # 读取视频帧
-            ret, frame = cap.read()
-            ocr = OcrRecogniser()
-            dt_box, rec_res = ocr.predict(frame)
-            # 如果读取成功
-            if ret:
-                # 根据默认字幕位置，则对视频帧进行裁剪，裁剪后处理
-                if default_subtitle_area is not None:
-                    frame = frame_preprocess(default_subtitle_area, frame)
-                ocr_queue.put((current_frame_no, frame, dt_box, rec_res))
+                # 任务携带了共享内存中的视频帧(主进程已裁剪)，直接读取
+                if task.frame_ref is not None:
+                    frame, origin = frame_ring.get(task.frame_ref), task.frame_ref.origin
+                else:
+                    # 读取视频帧
+                    # 如果total_ms不为空，则使用了VSF提取字幕
+                    if total_ms is not None:
+                        ret, frame = frame_source.read_at_ms(total_ms)
+                    else:
+                        ret, frame = frame_source.read(current_frame_no)
+                    # 如果读取失败
+                    if not ret:
+                        continue
+                    # 先裁剪出字幕区域(或默认字幕位置)再识别
+                    frame, origin = crop_ocr_region(frame, roi_sub_area, default_subtitle_area, roi_margin)
+                pending.append([current_frame_no, frame, dt_box, rec_res, task.frame_ref, origin, False])
+            if len(pending) >= batch_size:
+                flush()
         except Exception as e:
             print(e)
             break
-    cap.release()
+    frame_source.release()
+    print(f'OCR model pool: {predictor_pool.stats()}, frame source: {frame_source.stats()}')
 
 
-def subtitle_extract_handler(task_queue, progress_queue, video_path, raw_subtitle_path, sub_area, options):
+def subtitle_extract_handler(task_queue, progress_queue, video_path, raw_subtitle_path, sub_area, options,
+                             frame_ring=None):
     """
     创建并开启一个视频帧提取线程与一个ocr识别线程
-    :param task_queue 任务队列，(total_frame_count总帧数, current_frame_no当前帧, dt_box检测框, rec_res识别结果, subtitle_area字幕区域)
+    :param task_queue 任务队列，OcrTask
     :param progress_queue 进度队列
     :param video_path 视频路径
     :param raw_subtitle_path 原始字幕文件路径
     :param sub_area 字幕区域
     :param options 选项
+    :param frame_ring 共享内存帧环
     """
     # 删除缓存
     if os.path.exists(raw_subtitle_path):
@@ -214,11 +315,12 @@ def subtitle_extract_handler(task_queue, progress_queue, video_path, raw_subtitl
     ocr_queue = queue.Queue(20)
     # 创建一个OCR事件生产者线程
     ocr_event_producer_thread = Thread(target=ocr_task_producer,
-                                       args=(ocr_queue, task_queue, progress_queue, video_path, raw_subtitle_path,),
+                                       args=(ocr_queue, task_queue, progress_queue, video_path, raw_subtitle_path,
+                                             sub_area, options, frame_ring,),
                                        daemon=True)
     # 创建一个OCR事件消费者提取线程
     ocr_event_consumer_thread = Thread(target=ocr_task_consumer,
-                                       args=(ocr_queue, raw_subtitle_path, sub_area, video_path, options,),
+                                       args=(ocr_queue, raw_subtitle_path, sub_area, video_path, options, frame_ring,),
                                        daemon=True)
     # 开启消费者线程
     ocr_event_producer_thread.start()
@@ -229,31 +331,212 @@ def subtitle_extract_handler(task_queue, progress_queue, video_path, raw_subtitl
     ocr_event_consumer_thread.join()
 
 
-def async_start(video_path, raw_subtitle_path, sub_area, options):
+def ocr_worker_config(use_gpu, cpu_threads, worker_num=1):
+    """
+    根据CPU核数与每个进程的推理线程数计算OCR进程数量
+    :param use_gpu 使用GPU时只开启一个OCR进程
+    :param cpu_threads 每个OCR进程的CPU推理线程数
+    :param worker_num OCR进程数量，小于等于0时自动计算
+    :return (worker_num OCR进程数量, cpu_threads 每个进程的CPU推理线程数)
+    """
+    if use_gpu:
+        return 1, cpu_threads
+    cpu_count = os.cpu_count() or 1
+    cpu_threads = max(int(cpu_threads), 1)
+    if worker_num <= 0:
+        worker_num = max(cpu_count // cpu_threads, 1)
+    # 所有进程的线程数之和不超过CPU核数
+    return worker_num, max(min(cpu_threads, cpu_count // worker_num), 1)
+
+
+def worker_block_size(block_size, worker_num, slot_count=None):
+    """
+    计算每次连续分发给同一个OCR进程的任务数
+    使用共享内存传输视频帧时，分发给同一个进程的一整块任务会同时占用槽位，
+    块大小超过slot_count // worker_num时第一个进程的待识别帧就会占满所有槽位，主进程阻塞在写入槽位上，
+    其他进程拿不到任务，多个进程退化为串行识别
+    :param block_size 配置的块大小
+    :param worker_num OCR进程数量
+    :param slot_count 共享内存槽位数量，为None时不限制
+    """
+    block_size = max(int(block_size), 1)
+    if slot_count is not None and worker_num > 1:
+        block_size = min(block_size, max(slot_count // worker_num, 1))
+    return block_size
+
+
+def dispatch_ocr_tasks(task_queue, worker_queues, progress_queue, block_size):
+    """
+    调度线程：将任务队列中的任务按连续的块轮流分发给各个OCR进程
+    :param task_queue 主进程的任务队列
+    :param worker_queues 每个OCR进程独立的任务队列
+    :param progress_queue 进度队列
+    :param block_size 每次连续分发给同一个进程的任务数
+    """
+    worker_index = 0
+    dispatched = 0
+    # 上一个任务被分发到的进程
+    last_worker_index = None
+    while True:
+        task = OcrTask(*task_queue.get(block=True))
+        if task.current_frame_no == -1:
+            # 每个OCR进程都需要收到结束标志
+            for worker_queue in worker_queues:
+                worker_queue.put(task)
+            break
+        progress_queue.put(task.current_frame_no)
+        if dispatched >= block_size:
+            worker_index = (worker_index + 1) % len(worker_queues)
+            dispatched = 0
+        # 复用上一帧结果的任务只能由处理上一帧的进程完成，否则退化为普通任务由该进程自行解码
+        if task.same_as_previous and worker_index != last_worker_index:
+            task = task._replace(same_as_previous=False)
+        worker_queues[worker_index].put(task)
+        last_worker_index = worker_index
+        dispatched += 1
+
+
+def merge_raw_subtitles(part_paths, raw_subtitle_path):
+    """
+    将各个OCR进程输出的原始字幕按帧号合并，同一帧内保持原有顺序
+    """
+    raw_store = RawSubtitleStore()
+    for part_path in part_paths:
+        if not os.path.exists(part_path):
+            continue
+        raw_store.extend(RawSubtitleStore.load(part_path))
+        os.remove(part_path)
+    raw_store.sort()
+    raw_store.save(raw_subtitle_path)
+
+
+def subtitle_extract_pool_handler(task_queue, progress_queue, video_path, raw_subtitle_path, sub_area, options,
+                                  frame_ring=None, worker_num=2):
+    """
+    创建worker_num个OCR进程分担同一个视频的识别任务，全部结束后合并原始字幕
+    :param task_queue 任务队列，OcrTask
+    :param progress_queue 进度队列
+    :param video_path 视频路径
+    :param raw_subtitle_path 原始字幕文件路径
+    :param sub_area 字幕区域
+    :param options 选项
+    :param frame_ring 共享内存帧环
+    :param worker_num OCR进程数量
+    """
+    if os.path.exists(raw_subtitle_path):
+        os.remove(raw_subtitle_path)
+    part_paths = [f'{raw_subtitle_path}.{i}' for i in range(worker_num)]
+    worker_queues = [Queue() for _ in range(worker_num)]
+    workers = [Process(target=subtitle_extract_handler,
+                       args=(worker_queue, None, video_path, part_path, sub_area, options, frame_ring,))
+               for worker_queue, part_path in zip(worker_queues, part_paths)]
+    for worker in workers:
+        worker.start()
+    block_size = worker_block_size(getattr(options, 'OCR_WORKER_BLOCK_SIZE', 64), worker_num,
+                                   frame_ring.slot_count if frame_ring is not None else None)
+    dispatch_ocr_tasks(task_queue, worker_queues, progress_queue, block_size)
+    for worker in workers:
+        worker.join()
+    merge_raw_subtitles(part_paths, raw_subtitle_path)
+    # 所有进程都结束后再通知主进程识别完成
+    progress_queue.put(-1)
+
+
+def async_start(video_path, raw_subtitle_path, sub_area, options, frame_ring=None, worker_num=1, in_process=False):
     """
     开始进程处理异步任务
+    frame_ring 共享内存帧环，为None时OCR进程根据帧号自行解码视频
+    worker_num OCR进程数量，大于1时由一个调度进程将任务分发给多个OCR进程
+    in_process 为True时在当前进程的线程中识别，复用当前进程模型池中已加载的模型(批量提取时使用)
     options.REC_CHAR_TYPE
     options.DROP_SCORE
     options.SUB_AREA_DEVIATION_RATE
     options.DEBUG_OCR_LOSS
+    options.SUB_AREA_ROI (可选)
+    options.SUB_AREA_ROI_MARGIN (可选)
+    options.OCR_BATCH_SIZE (可选)
+    options.OCR_BATCH_TIMEOUT (可选)
+    options.CPU_THREADS (可选)
+    options.OCR_WORKER_BLOCK_SIZE (可选)
+    options.CHECKPOINT_INTERVAL (可选)
+    options.RESUME_FRAME_NO (可选)
     """
     assert 'REC_CHAR_TYPE' in options, "options缺少参数：REC_CHAR_TYPE"
     assert 'DROP_SCORE' in options, "options缺少参数: DROP_SCORE'"
     assert 'SUB_AREA_DEVIATION_RATE' in options, "options缺少参数: SUB_AREA_DEVIATION_RATE"
     assert 'DEBUG_OCR_LOSS' in options, "options缺少参数: DEBUG_OCR_LOSS"
     # 创建一个任务队列
-    # 任务格式为：(total_frame_count总帧数, current_frame_no当前帧, dt_box检测框, rec_res识别结果, subtitle_area字幕区域)
+    # 任务格式为：OcrTask
     task_queue = Queue()
     # 创建一个进度更新队列
     progress_queue = Queue()
     # 新建一个进程
-    p = Process(target=subtitle_extract_handler,
-                args=(task_queue, progress_queue, video_path, raw_subtitle_path, sub_area, SimpleNamespace(**options),))
+    if in_process:
+        p = Thread(target=subtitle_extract_handler,
+                   args=(task_queue, progress_queue, video_path, raw_subtitle_path, sub_area,
+                         SimpleNamespace(**options), frame_ring,),
+                   daemon=True)
+    elif worker_num > 1:
+        p = Process(target=subtitle_extract_pool_handler,
+                    args=(task_queue, progress_queue, video_path, raw_subtitle_path, sub_area,
+                          SimpleNamespace(**options), frame_ring, worker_num,))
+    else:
+        p = Process(target=subtitle_extract_handler,
+                    args=(task_queue, progress_queue, video_path, raw_subtitle_path, sub_area,
+                          SimpleNamespace(**options), frame_ring,))
     # 启动进程
     p.start()
     return p, task_queue, progress_queue
 
 
+def translate_boxes(dt_box, origin):
+    """
+    将裁剪区域内的检测框换算回原视频帧坐标
+    :param dt_box 检测框
+    :param origin 裁剪区域左上角在原视频帧中的坐标(y, x)
+    """
+    oy, ox = origin
+    if dt_box is None or len(dt_box) == 0 or (oy == 0 and ox == 0):
+        return dt_box
+    return [[(point[0] + ox, point[1] + oy) for point in box] for box in dt_box]
+
+
+def sub_area_roi(frame_shape, sub_area, margin=0):
+    """
+    计算字幕区域向外扩展margin个像素后的识别区域，并限制在视频帧范围内
+    :return (ymin, ymax, xmin, xmax)
+    """
+    frame_height, frame_width = frame_shape[:2]
+    s_ymin, s_ymax, s_xmin, s_xmax = sub_area
+    return (max(int(s_ymin) - margin, 0), min(int(s_ymax) + margin, frame_height),
+            max(int(s_xmin) - margin, 0), min(int(s_xmax) + margin, frame_width))
+
+
+def crop_ocr_region(frame, sub_area=None, subtitle_area=None, margin=0):
+    """
+    在识别之前裁剪出需要OCR的区域
+    :param frame 视频帧
+    :param sub_area 用户指定的字幕区域，不为None时裁剪至该区域(外扩margin个像素)
+    :param subtitle_area 默认字幕出现的大致区域，没有指定sub_area时使用
+    :param margin 字幕区域外扩的像素
+    :return (region裁剪后的区域, origin裁剪区域左上角在原视频帧中的坐标(y, x))
+    """
+    if sub_area is not None:
+        ymin, ymax, xmin, xmax = sub_area_roi(frame.shape, sub_area, margin)
+        return frame[ymin:ymax, xmin:xmax], (ymin, xmin)
+    # 如果字幕出现的区域在下部分
+    if subtitle_area == SubtitleArea.LOWER_PART:
+        cropped = int(frame.shape[0] // 2)
+        # 将视频帧切割为下半部分
+        return frame[cropped:], (cropped, 0)
+    # 如果字幕出现的区域在上半部分
+    if subtitle_area == SubtitleArea.UPPER_PART:
+        cropped = int(frame.shape[0] // 2)
+        # 将视频帧切割为上半部分
+        return frame[:cropped], (0, 0)
+    return frame, (0, 0)
+
+
 def frame_preprocess(subtitle_area, frame):
     """
     将视频帧进行裁剪
@@ -263,18 +546,64 @@ def frame_preprocess(subtitle_area, frame):
     # if self.frame_width > 1280:
     #     scale_rate = round(float(1280 / self.frame_width), 2)
     #     frames = cv2.resize(frames, None, fx=scale_rate, fy=scale_rate, interpolation=cv2.INTER_AREA)
-    # 如果字幕出现的区域在下部分
-    if subtitle_area == SubtitleArea.LOWER_PART:
-        cropped = int(frame.shape[0] // 2)
-        # 将视频帧切割为下半部分
-        frame = frame[cropped:]
-    # 如果字幕出现的区域在上半部分
-    elif subtitle_area == SubtitleArea.UPPER_PART:
-        cropped = int(frame.shape[0] // 2)
-        # 将视频帧切割为下半部分
-        frame = frame[:cropped]
+    frame, _ = crop_ocr_region(frame, subtitle_area=subtitle_area)
     return frame
 
 
+def _simulate_worker_pool(worker_num, slot_count, block_size, task_count=256, ocr_seconds=0.01):
+    """
+    模拟共享内存槽位有限时多个OCR进程的识别过程，仅用于对比测试
+    解码线程为每一帧占用一个槽位后放入任务队列，由dispatch_ocr_tasks分发，每个模拟进程识别一帧耗时ocr_seconds后归还槽位
+    :return (耗时(秒), 同时识别的最大进程数, 平均同时识别的进程数)
+    """
+    import threading
+    import time
+    free_slots = queue.Queue()
+    for slot in range(slot_count):
+        free_slots.put(slot)
+    task_queue, progress_queue = queue.Queue(), queue.Queue()
+    worker_queues = [queue.Queue() for _ in range(worker_num)]
+    lock = threading.Lock()
+    busy = [0, 0]
+    busy_time = [0.]
+
+    def decode():
+        for frame_no in range(1, task_count + 1):
+            slot = free_slots.get()
+            task_queue.put((task_count, frame_no, None, None, None, None, slot, False))
+        task_queue.put((task_count, -1, None, None, None, None, None, False))
+
+    def work(worker_queue):
+        while True:
+            task = OcrTask(*worker_queue.get())
+            if task.current_frame_no == -1:
+                break
+            with lock:
+                busy[0] += 1
+                busy[1] = max(busy[1], busy[0])
+            time.sleep(ocr_seconds)
+            with lock:
+                busy[0] -= 1
+                busy_time[0] += ocr_seconds
+            free_slots.put(task.frame_ref)
+
+    start = time.time()
+    threads = [Thread(target=decode)] + [Thread(target=work, args=(q,)) for q in worker_queues]
+    for thread in threads:
+        thread.start()
+    dispatch_ocr_tasks(task_queue, worker_queues, progress_queue, block_size)
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+    return elapsed, busy[1], busy_time[0] / elapsed
+
+
 if __name__ == "__main__":
-    pass
+    # 对比共享内存槽位有限时，限制块大小前后多个OCR进程是否同时识别
+    slot_count, configured_block_size = 16, 64
+    for worker_num in (1, 2, 4):
+        for name, block_size in (('configured', configured_block_size),
+                                 ('capped', worker_block_size(configured_block_size, worker_num, slot_count))):
+            elapsed, max_busy, avg_busy = _simulate_worker_pool(worker_num, slot_count, block_size)
+            print(f'workers: {worker_num}, {name} block size: {block_size}, elapsed: {elapsed:.2f}s, '
+                  f'max concurrent workers: {max_busy}, average concurrent workers: {avg_busy:.2f}')
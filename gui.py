@@ -468,6 +468,8 @@ class LanguageModeGUI:
             config_language_mode_gui['ModeAuto']: 'auto',
             config_language_mode_gui['ModeFast']: 'fast',
             config_language_mode_gui['ModeAccurate']: 'accurate',
+            config_language_mode_gui['ModeAccurateCPU']: 'accurate_cpu',
+            config_language_mode_gui['ModeFastInt8']: 'fast_int8',
         }
         self.MODE_KEY_NAME_MAP = {v: k for k, v in self.MODE_NAME_KEY_MAP.items()}
 
@@ -541,12 +543,20 @@ class LanguageModeGUI:
 
     @staticmethod
     def set_config(config_file, interface, language_code, mode):
+        # 保留界面中没有的推理后端设置
+        backend = None
+        if os.path.exists(config_file):
+            config = configparser.ConfigParser()
+            config.read(config_file, encoding='utf-8')
+            backend = config['DEFAULT'].get('Backend')
         # 写入配置文件
         with open(config_file, mode='w', encoding='utf-8') as f:
             f.write('[DEFAULT]\n')
             f.write(f'Interface = {interface}\n')
             f.write(f'Language = {language_code}\n')
             f.write(f'Mode = {mode}\n')
+            if backend:
+                f.write(f'Backend = {backend}\n')
 
     def parse_config(self, config_file):
         if not os.path.exists(config_file):